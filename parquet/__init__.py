@@ -1,26 +1,47 @@
-import gzip
 import json
 import logging
+import mmap
+import os
 import struct
 import cStringIO
 import sys
 from collections import defaultdict
+from itertools import chain, izip, repeat
 from ttypes import (FileMetaData, CompressionCodec, Encoding,
                     FieldRepetitionType, PageHeader, PageType, Type)
 from thrift.protocol import TCompactProtocol
 from thrift.transport import TTransport
+import cache
+import columns
+import compact
+import compression
+import converters
 import encoding
+import metadata
+import parallel
+import pool
 import schema
+from planner import IOPlanner
+from prefetch import Prefetcher
+from source import Cursor, PositionalFile
 import binascii
 
 #logging.basicConfig(level=logging.DEBUG)
 logger = logging.getLogger("parquet")
 
-try:
-    import snappy
-except ImportError:
-    logger.warn(
-        "Couldn't import snappy. Support for snappy compression disabled.")
+# Number of bytes read from the end of a file in one go when loading the
+# footer. Footers larger than this need a second read.
+FOOTER_TAIL_SIZE = 64 * 1024
+
+# Decode footers and page headers with the buffer based decoder in
+# parquet.compact instead of the generated thrift code. Can be switched off
+# at runtime, e.g. to compare the two.
+FAST_DECODER = True
+
+# Number of bytes read ahead when decoding a page header from a file object
+# with the fast decoder. Larger headers (e.g. with big statistics) are
+# retried with a bigger read.
+PAGE_HEADER_READ_SIZE = 256
 
 
 class ParquetFormatException(Exception):
@@ -48,21 +69,127 @@ def _get_footer_size(fo):
     return tup[0]
 
 
-def _read_footer(fo):
-    """Reads the footer from the given file object, returning a FileMetaData
-    object. This method assumes that the fo references a valid parquet file"""
-    footer_size = _get_footer_size(fo)
+def _read_footer_bytes(fo, tail_size=None):
+    """Reads the serialized footer from the end of the given file object.
+
+    A single block of tail_size bytes is read from the end of the file, which
+    holds the footer length, the trailing magic bytes and (for all but very
+    wide files) the footer itself. The file is only read a second time if the
+    footer turns out to be larger than the block. Returns a tuple of the
+    footer bytes and the first four bytes of the file if the block reached
+    the start of the file (None otherwise)."""
+    if tail_size is None:
+        tail_size = FOOTER_TAIL_SIZE
+    fo.seek(0, 2)
+    file_size = fo.tell()
+    block_size = min(max(tail_size, 12), file_size)
+    fo.seek(-block_size, 2)
+    block = fo.read(block_size)
+    if len(block) < 12 or block[-4:] != 'PAR1':
+        raise ParquetFormatException("{0} is not a valid parquet file "
+                                     "(missing magic bytes)"
+                                     .format(getattr(fo, 'name', fo)))
+    footer_size = struct.unpack("<i", block[-8:-4])[0]
     logger.debug("Footer size in bytes: %s", footer_size)
-    fo.seek(-(8 + footer_size), 2)  # seek to beginning of footer
-    tin = TTransport.TFileObjectTransport(fo)
+    if footer_size < 0 or footer_size + 8 > file_size:
+        raise ParquetFormatException("Invalid footer size: {0}"
+                                     .format(footer_size))
+    missing = footer_size + 8 - block_size
+    if missing > 0:
+        logger.debug("Footer exceeds tail block, reading %s more bytes",
+                     missing)
+        fo.seek(-(8 + footer_size), 2)
+        footer_bytes = fo.read(missing) + block[:-8]
+    else:
+        footer_bytes = block[block_size - footer_size - 8:-8]
+    header_magic = block[:4] if block_size == file_size else None
+    return footer_bytes, header_magic
+
+
+def _decode_footer(footer_bytes, lazy=False):
+    """Decodes a FileMetaData object from the serialized footer bytes. If lazy
+    is True, a metadata.LazyFileMetaData is returned instead, which decodes
+    the ColumnChunks of each row group on demand."""
+    if lazy:
+        return metadata.LazyFileMetaData(footer_bytes, fast=FAST_DECODER)
+    if FAST_DECODER:
+        return compact.read_struct(footer_bytes, 0, FileMetaData)[0]
+    tin = TTransport.TMemoryBuffer(footer_bytes)
     pin = TCompactProtocol.TCompactProtocol(tin)
     fmd = FileMetaData()
     fmd.read(pin)
     return fmd
 
 
+def _read_footer(fo, tail_size=None, lazy=False):
+    """Reads the footer from the given file object, returning a FileMetaData
+    object. Only the footer magic bytes are verified; the footer is fetched
+    with a single read in the common case (see _read_footer_bytes)."""
+    footer_bytes, _ = _read_footer_bytes(fo, tail_size)
+    return _decode_footer(footer_bytes, lazy)
+
+
+def _file_key(fo):
+    """Returns the (path, size, mtime) tuple identifying the file behind the
+    given file object, or None if it isn't backed by a named file."""
+    name = getattr(fo, 'name', None)
+    if not isinstance(name, basestring):
+        return None
+    try:
+        st = os.fstat(fo.fileno())
+    except (AttributeError, EnvironmentError, ValueError):
+        return None
+    return (os.path.abspath(name), st.st_size, st.st_mtime)
+
+
+def _read_footer_entry(fo, tail_size=None, header_check=False, lazy=False):
+    """Like _read_footer, but returns a metadata.FooterEntry, which is looked
+    up in (and added to) the process-wide cache.footer_cache first. File
+    objects that aren't backed by a named file are never cached. If
+    header_check is True, the header magic bytes are verified when they're
+    covered by the tail block."""
+    key = _file_key(fo)
+    if key is not None:
+        key += (lazy,)
+        entry = cache.footer_cache.get(key)
+        if entry is not None:
+            return entry
+    footer_bytes, header_magic = _read_footer_bytes(fo, tail_size)
+    if header_check and header_magic is not None and header_magic != 'PAR1':
+        raise ParquetFormatException("{0} is not a valid parquet file "
+                                     "(missing magic bytes)"
+                                     .format(getattr(fo, 'name', fo)))
+    entry = metadata.FooterEntry(_decode_footer(footer_bytes, lazy))
+    if key is not None:
+        cache.footer_cache.put(key, entry, entry.approximate_size())
+    return entry
+
+
+def _read_footer_cached(fo, tail_size=None, header_check=False,
+                        lazy=False):
+    """Like _read_footer, but looks the FileMetaData up in (and adds it to)
+    the process-wide cache.footer_cache first, see _read_footer_entry."""
+    return _read_footer_entry(fo, tail_size, header_check, lazy).footer
+
+
 def _read_page_header(fo):
     """Reads the page_header from the given fo"""
+    if FAST_DECODER:
+        start = fo.tell()
+        size = PAGE_HEADER_READ_SIZE
+        while True:
+            data = fo.read(size)
+            try:
+                ph, pos = compact.read_struct(data, 0, PageHeader)
+            except IndexError:
+                if len(data) < size:
+                    raise EOFError("Truncated page header at offset {0}"
+                                   .format(start))
+                size *= 4
+                fo.seek(start, 0)
+                continue
+            fo.seek(start + pos, 0)
+            return ph
     tin = TTransport.TFileObjectTransport(fo)
     pin = TCompactProtocol.TCompactProtocol(tin)
     ph = PageHeader()
@@ -70,15 +197,19 @@ def _read_page_header(fo):
     return ph
 
 
-def read_footer(filename):
-    """Reads and returns the FileMetaData object for the given file."""
+def read_footer(filename, tail_size=None, lazy=False):
+    """Reads and returns the FileMetaData object for the given file.
+
+    The header magic bytes are only checked if the file is small enough to be
+    covered by the tail block; for larger files the check would cost an
+    extra read, and the footer magic bytes are verified either way. Results
+    are cached in cache.footer_cache keyed by (path, size, mtime).
+
+    If lazy is True, the ColumnChunks of each row group are only decoded
+    when they are accessed (see metadata.LazyFileMetaData)."""
     with open(filename, 'rb') as fo:
-        if not _check_header_magic_bytes(fo) or \
-           not _check_footer_magic_bytes(fo):
-            raise ParquetFormatException("{0} is not a valid parquet file "
-                                         "(missing magic bytes)"
-                                         .format(filename))
-        return _read_footer(fo)
+        return _read_footer_cached(fo, tail_size, header_check=True,
+                                   lazy=lazy)
 
 
 def _get_name(type_, value):
@@ -90,11 +221,7 @@ def _get_name(type_, value):
 def _get_offset(cmd):
     """Returns the offset into the cmd based upon if it's a dictionary page or
     a data page"""
-    dict_offset = cmd.dictionary_page_offset
-    data_offset = cmd.data_page_offset
-    if dict_offset is None or data_offset < dict_offset:
-        return data_offset
-    return dict_offset
+    return metadata.chunk_offset(cmd)
 
 
 def dump_metadata(filename, show_row_group_metadata, out=sys.stdout):
@@ -143,7 +270,7 @@ def dump_metadata(filename, show_row_group_metadata, out=sys.stdout):
                         "dictionary_page_offset={dictionary_page_offset}".format(
                             type=_get_name(Type, cmd.type),
                             offset=cg.file_offset,
-                            codec=_get_name(CompressionCodec, cmd.codec),
+                            codec=compression.codec_name(cmd.codec),
                             encodings=",".join(
                                 [_get_name(
                                     Encoding, s) for s in cmd.encodings]),
@@ -196,26 +323,25 @@ def dump_metadata(filename, show_row_group_metadata, out=sys.stdout):
                                     rep_level_encoding=rep_level_encoding))
 
 
-def _read_page(fo, page_header, column_metadata):
-    """Internal function to read the data page from the given file-object
-    and convert it to raw, uncompressed bytes (if necessary)."""
-    bytes_from_file = fo.read(page_header.compressed_page_size)
+def _decompress_page(bytes_from_file, page_header, column_metadata):
+    """Internal function to convert the (possibly compressed) bytes of a page
+    to raw, uncompressed bytes (if necessary)."""
     codec = column_metadata.codec
     if codec is not None and codec != CompressionCodec.UNCOMPRESSED:
-        if column_metadata.codec == CompressionCodec.SNAPPY:
-            raw_bytes = snappy.decompress(bytes_from_file)
-        elif column_metadata.codec == CompressionCodec.GZIP:
-            io_obj = cStringIO.StringIO(bytes_from_file)
-            with gzip.GzipFile(fileobj=io_obj, mode='rb') as f:
-                raw_bytes = f.read()
-        else:
+        decompress = compression.decompressor(codec)
+        if decompress is None:
             raise ParquetFormatException(
-                "Unsupported Codec: {0}".format(codec))
+                "Unsupported Codec: {0}".format(
+                    compression.codec_name(codec)))
+        if isinstance(bytes_from_file, memoryview):
+            bytes_from_file = bytes_from_file.tobytes()
+        raw_bytes = decompress(bytes_from_file,
+                               page_header.uncompressed_page_size)
     else:
         raw_bytes = bytes_from_file
     logger.debug(
         "Read page with compression type {0}. Bytes {1} -> {2}".format(
-        _get_name(CompressionCodec, codec),
+        compression.codec_name(codec),
         page_header.compressed_page_size,
         page_header.uncompressed_page_size))
     assert len(raw_bytes) == page_header.uncompressed_page_size, \
@@ -225,24 +351,267 @@ def _read_page(fo, page_header, column_metadata):
     return raw_bytes
 
 
-def _read_data(fo, fo_encoding, value_count, bit_width):
-    """Internal method to read data from the file-object using the given
-    encoding. The data could be definition levels, repetition levels, or
-    actual values.
+def _read_page(fo, page_header, column_metadata):
+    """Internal function to read the data page from the given file-object
+    and convert it to raw, uncompressed bytes (if necessary)."""
+    bytes_from_file = fo.read(page_header.compressed_page_size)
+    return _decompress_page(bytes_from_file, page_header, column_metadata)
+
+
+def _read_into(fo, buf, size):
+    """Reads size bytes from fo into the start of the bytearray buf and
+    returns a buffer object over them."""
+    view = memoryview(buf)[:size]
+    readinto = getattr(fo, 'readinto', None)
+    if readinto is not None:
+        read = readinto(view)
+    else:
+        data = fo.read(size)
+        read = len(data)
+        view[:read] = data
+    if read != size:
+        raise ParquetFormatException(
+            "Truncated page: read {0} of {1} bytes".format(read, size))
+    return buffer(buf, 0, size)
+
+
+def _read_column_chunk(fo, column_metadata):
+    """Reads the whole column chunk described by column_metadata (all of its
+    pages, including the headers) with a single read."""
+    fo.seek(_get_offset(column_metadata), 0)
+    size = column_metadata.total_compressed_size
+    data = fo.read(size)
+    if len(data) != size:
+        raise ParquetFormatException(
+            "Truncated column chunk: read {0} of {1} bytes".format(
+                len(data), size))
+    return data
+
+
+def _parse_page_header(data, pos):
+    """Decodes the page header at pos of an in-memory column chunk, returning
+    it along with the position of the page that follows it."""
+    if FAST_DECODER:
+        return compact.read_struct(data, pos, PageHeader)
+    io_obj = cStringIO.StringIO(data)
+    io_obj.seek(pos)
+    ph = _read_page_header(io_obj)
+    return ph, io_obj.tell()
+
+
+def _slice(data, start, end):
+    """Returns a zero-copy view of data[start:end]. For anything but a
+    memoryview this is a buffer object, which (unlike a memoryview) zlib and
+    snappy accept without a copy on python 2."""
+    if isinstance(data, memoryview):
+        return data[start:end]
+    return buffer(data, start, end - start)
+
+
+def _map_file(fo):
+    """Memory maps the (whole) file behind fo for reading."""
+    return mmap.mmap(fo.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+def _count_values(page_header):
+    """Returns the number of values in the given page (0 for pages other than
+    data pages)."""
+    if page_header.type == PageType.DATA_PAGE:
+        return page_header.data_page_header.num_values
+    if page_header.type == PageType.DATA_PAGE_V2:
+        return page_header.data_page_header_v2.num_values
+    return 0
+
+
+def _iter_pages(fo, column_metadata, coalesce=False, data=None,
+                buffer_pool=None):
+    """Yields a (page_header, page bytes) tuple for every page of the column
+    chunk described by column_metadata, along with the file offset of the
+    page (its header). The page bytes are still compressed.
+
+    If a pool.BufferPool is given, pages read from fo are read into buffers
+    from it, and each page is only valid until the next one is requested.
+
+    If coalesce is True, the whole chunk is fetched with a single read, the
+    headers are parsed from memory and the page bytes are zero-copy slices
+    of the chunk (see _slice). The same is done if the bytes of the chunk are
+    passed in as data, e.g. fetched by a planner.IOPlanner or a buffer over
+    a memory mapped file. Otherwise every header and page is read from
+    fo."""
+    num_values = column_metadata.num_values
+    values_seen = 0
+    if data is None and not coalesce:
+        offset = _get_offset(column_metadata)
+        fo.seek(offset, 0)
+        while values_seen < num_values:
+            ph = _read_page_header(fo)
+            values_seen += _count_values(ph)
+            if buffer_pool is None:
+                yield ph, fo.read(ph.compressed_page_size), offset
+            else:
+                buf = buffer_pool.acquire(ph.compressed_page_size)
+                yield (ph, _read_into(fo, buf, ph.compressed_page_size),
+                       offset)
+                buffer_pool.release(buf)
+            offset = fo.tell()
+        return
+    if data is None:
+        data = _read_column_chunk(fo, column_metadata)
+    pos = 0
+    while values_seen < num_values:
+        try:
+            ph, start = _parse_page_header(data, pos)
+            end = start + ph.compressed_page_size
+        except (IndexError, EOFError):
+            end = None
+        if end is None or end > len(data):
+            # Some writers leave parts of the chunk out of
+            # total_compressed_size, so the chunk has to be read further.
+            fo.seek(_get_offset(column_metadata) + len(data), 0)
+            more = fo.read(max(PAGE_HEADER_READ_SIZE,
+                               (end or 0) - len(data)))
+            if not more:
+                raise ParquetFormatException("Truncated column chunk")
+            if isinstance(data, memoryview):
+                data = data.tobytes()
+            data = data[:] + more  # buffer slices are copied to a str
+            continue
+        values_seen += _count_values(ph)
+        yield ph, _slice(data, start, end), _get_offset(column_metadata) + pos
+        pos = end
+
+
+def _chunk_pages(fo, chunks, coalesce=False, buffer_pool=None,
+                 file_key=None):
+    """Yields a (column_metadata, page_header, page bytes, cache key) tuple
+    for every page of the given (column_metadata, chunk bytes or None)
+    chunks, in order. See _iter_pages.
+
+    If file_key (see _file_key) is given, dictionary pages and compressed
+    data pages get file_key plus the offset of the page as their cache key.
+    The cache key of any other page is None."""
+    for column_metadata, data in chunks:
+        compressed = column_metadata.codec not in (
+            None, CompressionCodec.UNCOMPRESSED)
+        for ph, page, offset in _iter_pages(fo, column_metadata, coalesce,
+                                            data, buffer_pool):
+            key = None
+            if file_key is not None and (
+                    ph.type == PageType.DICTIONARY_PAGE or
+                    ph.type == PageType.DATA_PAGE and compressed):
+                key = file_key + (offset,)
+            yield column_metadata, ph, page, key
+
+
+def _cached(key, load, size):
+    """Returns the value cached in cache.page_cache under key, calling load()
+    to get it (and adding it, size(value) bytes in size) on a miss. A key of
+    None bypasses the cache."""
+    if key is None:
+        return load()
+    value = cache.page_cache.get(key)
+    if value is None:
+        value = load()
+        cache.page_cache.put(key, value, size(value))
+    return value
+
+
+def _dictionary_size(dict_items):
+    return sys.getsizeof(dict_items) + sum(sys.getsizeof(v)
+                                           for v in dict_items)
+
+
+def _load_page(item):
+    """Loads the page of a (column_metadata, page_header, page bytes, cache
+    key) tuple: data pages are decompressed and dictionary pages decoded to
+    the list of dictionary values. Pages with a cache key are looked up in
+    (and added to) cache.page_cache; a cached dictionary is shared and must
+    not be modified."""
+    column_metadata, ph, page, key = item
+    if ph.type == PageType.DATA_PAGE:
+        page = _cached(
+            key, lambda: _decompress_page(page, ph, column_metadata), len)
+    elif ph.type == PageType.DICTIONARY_PAGE:
+        page = _cached(key, lambda: _decode_dictionary_page(
+            _decompress_page(page, ph, column_metadata), column_metadata,
+            ph.dictionary_page_header.num_values), _dictionary_size)
+    return column_metadata, ph, page, key
+
+
+def _load_pages(pages):
+    """Loads the given (column_metadata, page_header, page bytes, cache key)
+    tuples, see _load_page."""
+    for item in pages:
+        yield _load_page(item)
+
+
+def _load_parallel(pages, workers):
+    """Like _load_pages, loading the pages on the given parallel.WorkerPool.
+    Pages are still returned in order."""
+    if workers.processes:
+        pages = ((cmd, ph, str(page) if isinstance(page, buffer)
+                  else page.tobytes() if isinstance(page, memoryview)
+                  else page, key)
+                 for cmd, ph, page, key in pages)
+    return workers.imap(_load_page, pages)
+
+
+def _read_pages(fo, chunks, coalesce=False, prefetcher=None, workers=None,
+                file_key=None):
+    """Yields a (column_metadata, page_header, page, cache key) tuple for
+    every page of the given chunks, where data pages are decompressed and
+    dictionary pages are decoded to the list of dictionary values (see
+    _load_page). Each page is only valid until the next one is requested,
+    as pages read from fo go through buffers from pool.page_buffers.
+
+    With a parallel.WorkerPool as workers, pages are loaded by its workers,
+    several at a time. With a prefetch.Prefetcher, the pages are read (and
+    loaded, if its decompress is set) by a background thread ahead of the
+    consumer. fo must then not be used by anything else until the pages are
+    consumed.
+
+    If file_key is given, loaded pages are cached in cache.page_cache (see
+    _chunk_pages)."""
+    if prefetcher is None and workers is None:
+        return _load_pages(_chunk_pages(
+            fo, chunks, coalesce, pool.page_buffers, file_key))
+    # pages read ahead can't share pooled buffers.
+    pages = _chunk_pages(fo, chunks, coalesce, file_key=file_key)
+    size = lambda item: item[1].uncompressed_page_size
+    if workers is not None:
+        pages = _load_parallel(pages, workers)
+        if prefetcher is not None:
+            pages = prefetcher.prefetch(pages, size)
+        return pages
+    if prefetcher.decompress:
+        return prefetcher.prefetch(_load_pages(pages), size)
+    return _load_pages(prefetcher.prefetch(pages, size))
+
+
+def _read_levels(fo, fo_encoding, value_count, bit_width):
+    """Reads value_count repetition or definition levels from the
+    file-object using the given encoding. Returns a tuple of the levels as an
+    array of ints (see encoding._new_int_array) and the level shared by all
+    of them if they are stored as a single rle run (None otherwise). The
+    levels aren't decoded at all in the latter case and are returned as
+    None.
     """
-    vals = []
+    levels = encoding._new_int_array(0)
     if fo_encoding == Encoding.RLE:
-        seen = 0
-        while seen < value_count:
-            values = encoding.read_rle_bit_packed_hybrid(fo, bit_width)
-            if values is None:
-                break  # EOF was reached.
-            vals += values
-            seen += len(values)
+        length_bytes = fo.read(4)
+        if len(length_bytes) < 4:
+            return levels, None  # EOF was reached.
+        length = struct.unpack("<i", length_bytes)[0]
+        data = fo.read(length)
+        run_value = encoding.rle_run_value(data, bit_width, value_count)
+        if run_value is not None:
+            return None, run_value
+        levels = encoding.read_rle_bit_packed_hybrid_batch(data, bit_width,
+                                                           value_count)
     elif fo_encoding == Encoding.BIT_PACKED:
         raise NotImplementedError("Bit packing not yet supported")
 
-    return vals
+    return levels, None
 
 
 def read_data_page(fo, schema_helper, page_header, column_metadata,
@@ -251,129 +620,83 @@ def read_data_page(fo, schema_helper, page_header, column_metadata,
     metadata in the schema_helper, page_header, column_metadata, and
     (optional) dictionary. Returns a list of values.
     """
-    daph = page_header.data_page_header
-    raw_bytes = _read_page(fo, page_header, column_metadata)
-    io_obj = cStringIO.StringIO(raw_bytes)
-    vals = []
+    _, _, vals = _read_data_page(fo, schema_helper, page_header,
+                                 column_metadata, dictionary, nullable=True)
+    return vals.tolist()
 
-    logger.debug("  path_in_schema: %s",
-                 '.'.join(column_metadata.path_in_schema))
-    logger.debug("  definition_level_encoding: %s",
-                 _get_name(Encoding, daph.definition_level_encoding))
-    logger.debug("  repetition_level_encoding: %s",
-                 _get_name(Encoding, daph.repetition_level_encoding))
-    logger.debug("  encoding: %s", _get_name(Encoding, daph.encoding))
 
-    max_repetition_level = schema_helper.max_repetition_level(
-            column_metadata.path_in_schema)
-    logger.debug("  max_repetition_level: %s", max_repetition_level)
-    if max_repetition_level > 0:
-        bit_width = encoding.width_from_max_int(max_repetition_level)
-        if bit_width == 0:
-            repetition_levels = [0] * daph.num_values
-        else:
-            repetition_levels = _read_data(io_obj,
-                                       daph.repetition_level_encoding,
-                                       daph.num_values,
-                                       bit_width)
-        logger.debug("  Repetition levels: %s", repetition_levels)
-
-    definition_levels = []
-    max_definition_level = schema_helper.max_definition_level(
-            column_metadata.path_in_schema)
-    logger.debug("  max_definition_level: %s", max_definition_level)
-    if max_definition_level > 0:
-        bit_width = encoding.width_from_max_int(max_definition_level)
-        logger.debug("  max def level: %s   bit_width: %s  values: %s",
-                     max_definition_level, bit_width, daph.num_values)
-        definition_levels = _read_data(io_obj,
-                                           daph.definition_level_encoding,
-                                           daph.num_values,
-                                           bit_width)
-        logger.debug("  Definition levels: %s", definition_levels)
-
-    num_nulls = 0
-    for i in range(daph.num_values):
-        if len(definition_levels)>0:
-            dl = definition_levels[i]
-            if dl < max_definition_level:
-                num_nulls += 1
-    num_not_null = daph.num_values - num_nulls
-    if daph.encoding == Encoding.PLAIN:
-        for i in range(num_not_null):
-            vals.append(encoding.read_plain(io_obj, column_metadata.type, None))
-    elif daph.encoding == Encoding.PLAIN_DICTIONARY:
-        # bit_width is stored as single byte.
-        bit_width = struct.unpack("<B", io_obj.read(1))[0]
-        logger.debug("bit_width: %d", bit_width)
-        total_seen = 0
-        dict_values_bytes = io_obj.read()
-        dict_values_io_obj = cStringIO.StringIO(dict_values_bytes)
-        # TODO jcrobak -- not sure that this loop is needed?
-        while total_seen < num_not_null:
-            values = encoding.read_rle_bit_packed_hybrid(
-                dict_values_io_obj, bit_width, len(dict_values_bytes))
-            if len(values) + total_seen > daph.num_values:
-                values = values[0: daph.num_values - total_seen]
-            vals += [dictionary[v] for v in values]
-            total_seen += len(values)
-    elif daph.encoding == Encoding.DELTA_BYTE_ARRAY:
-        vals = encoding.read_delta_byte_array(io_obj)
-    elif daph.encoding == Encoding.DELTA_BINARY_PACKED:
-        vals = encoding.read_delta_binary_packed(io_obj)
-    else:
-        raise ParquetFormatException("Unsupported encoding: %s",
-                                     _get_name(Encoding, daph.encoding))
-    if len(definition_levels)>0:
-        null_mixed = []
-        idx2 = 0
-        for i in range(daph.num_values):
-            dl = definition_levels[i]
-            if dl < max_definition_level:
-                null_mixed.append(None)
-            else:
-                null_mixed.append(vals[idx2])
-                idx2 += 1
-        return null_mixed
-    else:
-        return vals
-
-
-def read_dictionary_page(fo, page_header, column_metadata):
-    raw_bytes = _read_page(fo, page_header, column_metadata)
+def _decode_dictionary_page(raw_bytes, column_metadata, num_values,
+                            type_length=None):
+    """Decodes the uncompressed bytes of a dictionary page to the list of
+    its num_values values. The values of a FIXED_LEN_BYTE_ARRAY column are
+    type_length bytes long; as they all have the same length, it follows
+    from the size of the page if it isn't given."""
+    if column_metadata.type == Type.BOOLEAN:
+        values = encoding.read_plain_boolean_batch(raw_bytes, num_values)[0]
+        return values if isinstance(values, list) else values.tolist()
+    if column_metadata.type == Type.FIXED_LEN_BYTE_ARRAY:
+        if type_length is None:
+            type_length = len(raw_bytes) // num_values if num_values else 0
+        return encoding.read_plain_fixed_strs(raw_bytes, num_values,
+                                              type_length)
     io_obj = cStringIO.StringIO(raw_bytes)
     dict_items = []
     while io_obj.tell() < len(raw_bytes):
-        # TODO - length for fixed byte array
         dict_items.append(
             encoding.read_plain(io_obj, column_metadata.type, None))
     return dict_items
 
 
+def read_dictionary_page(fo, page_header, column_metadata, type_length=None):
+    """Reads the dictionary page from the given file-like object, returning
+    the list of dictionary values. type_length is the type_length of the
+    SchemaElement of FIXED_LEN_BYTE_ARRAY columns."""
+    raw_bytes = _read_page(fo, page_header, column_metadata)
+    return _decode_dictionary_page(
+        raw_bytes, column_metadata,
+        page_header.dictionary_page_header.num_values, type_length)
+
+
 def _dump(fo, options, out=sys.stdout):
     def println(value):
         out.write(value + "\n")
 
-    footer = _read_footer(fo)
-    schema_helper = schema.SchemaHelper(footer.schema)
-    total_count = 0
-    for rg in footer.row_groups:
-        res = defaultdict(list)
-        row_group_rows = rg.num_rows
-        for idx, cg in enumerate(rg.columns):
-            dict_items = []
-            cmd = cg.meta_data
-            # skip if the list of columns is specified and this isn't in it
-            if options.col and not ".".join(cmd.path_in_schema) in options.col:
-                continue
-
-            offset = _get_offset(cmd)
-            fo.seek(offset, 0)
-            values_seen = 0
-            logger.debug("reading column chunk of type: %s",
-                         _get_name(Type, cmd.type))
-            while values_seen < row_group_rows:
-                ph = _read_page_header(fo)
+    entry = _read_footer_entry(fo)
+    footer = entry.footer
+    schema_helper = entry.schema_helper
+    index = entry.index
+    # skip columns that aren't in the list of columns, if one is specified
+    if options.col:
+        columns = sorted(index.column(c) for c in options.col if c in index)
+    else:
+        columns = range(index.num_columns)
+    coalesce = getattr(options, 'coalesce', False)
+    prefetch_depth = getattr(options, 'prefetch', 0)
+    prefetcher = Prefetcher(prefetch_depth) if prefetch_depth else None
+    # the mapping and the workers are released in the finally block below.
+    mapping = _map_file(fo) if getattr(options, 'memory_map', False) else None
+    num_workers = getattr(options, 'workers', 0)
+    workers = parallel.WorkerPool(num_workers) if num_workers else None
+    try:
+        total_count = 0
+        for rg_idx in range(index.num_row_groups):
+            res = defaultdict(list)
+            row_group_rows = index.num_rows[rg_idx]
+            chunks = []
+            for column in columns:
+                data = None
+                if mapping is not None:
+                    data = buffer(mapping, index.chunk(rg_idx, column)[0])
+                chunks.append((index.column_metadata(rg_idx, column), data))
+            current_cmd = None
+            for cmd, ph, page, _ in _read_pages(fo, chunks, coalesce,
+                                                prefetcher, workers):
+                if cmd is not current_cmd:
+                    current_cmd = cmd
+                    dict_items = []
+                    path = ".".join(cmd.path_in_schema)
+                    logger.debug("reading column chunk of type: %s",
+                                 _get_name(Type, cmd.type))
                 logger.debug("Reading page (type=%s, "
                              "uncompressed=%s bytes, "
                              "compressed=%s bytes)",
@@ -382,30 +705,35 @@ def _dump(fo, options, out=sys.stdout):
                              ph.compressed_page_size)
 
                 if ph.type == PageType.DATA_PAGE:
-                    values = read_data_page(fo, schema_helper, ph, cmd,
-                                            dict_items)
-                    res[".".join(cmd.path_in_schema)] += values
-                    values_seen += ph.data_page_header.num_values
+                    _, _, vals = _decode_data_page(
+                        page, schema_helper, ph, cmd, dict_items,
+                        nullable=True)
+                    res[path] += vals.tolist()
                 elif ph.type == PageType.DICTIONARY_PAGE:
                     logger.debug(ph)
                     assert dict_items == []
-                    dict_items = read_dictionary_page(fo, ph, cmd)
+                    dict_items = page
                     logger.debug("Dictionary: %s", str(dict_items))
                 else:
                     logger.warn("Skipping unknown page type={0}".format(
                         _get_name(PageType, ph.type)))
-        keys = options.col if options.col else [s.name for s in
-                                                footer.schema if s.name in res]
-        if options.format == "csv" and not options.no_headers:
-            println("\t".join(keys))
-        for i in range(rg.num_rows):
-            if options.limit != -1 and i + total_count >= options.limit:
-                return
-            if options.format == "csv":
-                println("\t".join(str(res[k][i]) for k in keys))
-            elif options.format == "json":
-                println(json.dumps(dict([(k, res[k][i]) for k in keys])))
-        total_count += rg.num_rows
+            keys = options.col if options.col else [
+                s.name for s in footer.schema if s.name in res]
+            if options.format == "csv" and not options.no_headers:
+                println("\t".join(keys))
+            for i in range(row_group_rows):
+                if options.limit != -1 and i + total_count >= options.limit:
+                    return
+                if options.format == "csv":
+                    println("\t".join(str(res[k][i]) for k in keys))
+                elif options.format == "json":
+                    println(json.dumps(dict([(k, res[k][i]) for k in keys])))
+            total_count += row_group_rows
+    finally:
+        if workers is not None:
+            workers.close()
+        if mapping is not None:
+            mapping.close()
 
 
 def dump(filename, options, out=sys.stdout):
@@ -413,10 +741,41 @@ def dump(filename, options, out=sys.stdout):
         return _dump(fo, options=options, out=out)
 
 
-def _read_data_page(fo, schema_helper, page_header, column_metadata,
-                    dictionary):
+def _decode_data_page(raw_bytes, schema_helper, page_header, column_metadata,
+                      dictionary, binary_arrays=False,
+                      dictionary_codes=False, nullable=False,
+                      int96_timestamps=False, converted_types=False,
+                      dictionary_converted=False, typed_arrays=False):
+    """Decodes the uncompressed bytes of a data page, returning a tuple of
+    the repetition levels, definition levels and (non-null) values. The
+    levels are arrays of ints (see encoding._new_int_array), which are
+    empty if the column has no levels of that kind.
+
+    If binary_arrays is True, the values of BYTE_ARRAY pages encoded PLAIN or
+    DELTA_LENGTH_BYTE_ARRAY are a columns.BinaryArray rather than a list,
+    and those of PLAIN FIXED_LEN_BYTE_ARRAY pages a (count, type_length)
+    uint8 numpy array (see encoding.read_plain_fixed_batch).
+    If dictionary_codes is True, the values of dictionary encoded pages are
+    a columns.DictionaryArray of the indices into dictionary.
+    If typed_arrays is True, the values of PLAIN INT32, INT64, FLOAT and
+    DOUBLE pages are a numpy array of their type (an array.array without
+    numpy) rather than a list, see encoding.read_plain_batch, and those of
+    PLAIN BOOLEAN pages a numpy bool array (see
+    encoding.read_plain_boolean_batch).
+
+    If nullable is True, the values are a columns.NullableArray with an
+    entry for every value of the page, null or not.
+
+    If int96_timestamps is True, INT96 values are decoded as Impala/Hive
+    timestamps into a datetime64[ns] numpy array (nanoseconds since the
+    epoch without numpy), see encoding.read_int96_timestamp_batch.
+
+    If converted_types is True, the values are converted to the logical
+    type given by the converted_type of the column, see converters. The
+    dictionary of dictionary encoded pages is converted instead of their
+    values, see _convert_dictionary; if dictionary_converted is True, the
+    caller has already done so once for the whole column chunk."""
     daph = page_header.data_page_header
-    raw_bytes = _read_page(fo, page_header, column_metadata)
     io_obj = cStringIO.StringIO(raw_bytes)
     vals = []
     column_path_name = '.'.join(column_metadata.path_in_schema)
@@ -427,84 +786,180 @@ def _read_data_page(fo, schema_helper, page_header, column_metadata,
                  _get_name(Encoding, daph.repetition_level_encoding))
     logger.debug("  encoding: %s", _get_name(Encoding, daph.encoding))
 
+    convert = None
+    if converted_types:
+        convert = converters.converter(
+            schema_helper.schema_element(column_path_name))
+        binary_arrays = binary_arrays or convert is not None
+
     max_repetition_level = schema_helper.max_repetition_level(column_path_name)
     logger.debug("  max_repetition_level: %s", max_repetition_level)
-    repetition_levels = []
+    repetition_levels = encoding._new_int_array(0)
     if max_repetition_level > 0:
         bit_width = encoding.width_from_max_int(max_repetition_level)
-        if bit_width == 0:
-            repetition_levels = [0] * daph.num_values
+        levels, run_value = None, 0
+        if bit_width > 0:
+            levels, run_value = _read_levels(io_obj,
+                                             daph.repetition_level_encoding,
+                                             daph.num_values, bit_width)
+        if levels is None:
+            repetition_levels = encoding._new_int_array(daph.num_values,
+                                                        run_value)
         else:
-            repetition_levels = _read_data(io_obj,
-                                       daph.repetition_level_encoding,
-                                       daph.num_values,
-                                       bit_width)
+            repetition_levels = levels
         logger.debug("  Repetition levels: %s ...", repetition_levels[0:10])
 
-    definition_levels = []
+    definition_levels = encoding._new_int_array(0)
     max_definition_level = schema_helper.max_definition_level(column_path_name)
     logger.debug("  max_definition_level: %s", max_definition_level)
     if max_definition_level > 0:
         bit_width = encoding.width_from_max_int(max_definition_level)
         logger.debug("  max def level: %s   bit_width: %s  values: %s",
                      max_definition_level, bit_width, daph.num_values)
-        definition_levels = _read_data(io_obj,
-                                       daph.definition_level_encoding,
-                                       daph.num_values,
-                                       bit_width)
+        levels, run_value = _read_levels(io_obj,
+                                         daph.definition_level_encoding,
+                                         daph.num_values, bit_width)
+        if levels is None:
+            definition_levels = encoding._new_int_array(daph.num_values,
+                                                        run_value)
+        else:
+            definition_levels = levels
         logger.debug("  Definition levels: %s ...", definition_levels[0:10])
-
-    num_nulls = 0
-    for i in range(daph.num_values):
-        if len(definition_levels)>0:
-            dl = definition_levels[i]
-            if dl < max_definition_level:
-                num_nulls += 1
+        valid, num_nulls = columns.validity(
+            levels, max_definition_level, run_value, daph.num_values)
+    else:
+        valid, num_nulls = None, 0
     num_not_null = daph.num_values - num_nulls
-    if daph.encoding == Encoding.PLAIN:
+    if daph.encoding == Encoding.PLAIN and \
+            column_metadata.type in encoding.FIXED_WIDTH_TYPES:
+        vals = encoding.read_plain_batch(raw_bytes, column_metadata.type,
+                                         num_not_null, io_obj.tell())
+        if convert is None and not typed_arrays:
+            vals = vals.tolist()
+        elif convert is None and encoding.numpy is not None:
+            # copied, as the page buffer may be reused for the next page.
+            vals = vals.copy()
+    elif daph.encoding == Encoding.PLAIN and \
+            column_metadata.type == Type.BOOLEAN:
+        vals = encoding.read_plain_boolean_batch(
+            raw_bytes, num_not_null, io_obj.tell())[0]
+        if not typed_arrays and not isinstance(vals, list):
+            vals = vals.tolist()
+    elif daph.encoding == Encoding.PLAIN and int96_timestamps and \
+            column_metadata.type == Type.INT96:
+        vals = encoding.read_int96_timestamp_batch(raw_bytes, num_not_null,
+                                                   io_obj.tell())
+    elif daph.encoding == Encoding.PLAIN and \
+            column_metadata.type == Type.FIXED_LEN_BYTE_ARRAY:
+        type_length = schema_helper.schema_element(
+            column_path_name).type_length
+        if binary_arrays and encoding.numpy is not None:
+            # copied, as the page buffer may be reused for the next page.
+            vals = encoding.read_plain_fixed_batch(
+                raw_bytes, num_not_null, type_length, io_obj.tell()).copy()
+        else:
+            vals = encoding.read_plain_fixed_strs(
+                raw_bytes, num_not_null, type_length, io_obj.tell())
+    elif daph.encoding == Encoding.PLAIN and binary_arrays and \
+            column_metadata.type == Type.BYTE_ARRAY:
+        vals = encoding.read_plain_byte_array_batch(
+            raw_bytes, num_not_null, io_obj.tell())[0]
+    elif daph.encoding == Encoding.PLAIN:
         for i in range(num_not_null):
             vals.append(encoding.read_plain(io_obj, column_metadata.type, None))
     elif daph.encoding == Encoding.PLAIN_DICTIONARY:
         # bit_width is stored as single byte.
         bit_width = struct.unpack("<B", io_obj.read(1))[0]
         logger.debug("bit_width: %d", bit_width)
-        total_seen = 0
-        dict_values_bytes = io_obj.read()
-        dict_values_io_obj = cStringIO.StringIO(dict_values_bytes)
-        while total_seen < num_not_null:
-            values = encoding.read_rle_bit_packed_hybrid(
-                dict_values_io_obj, bit_width, len(dict_values_bytes))
-            if len(values) + total_seen > daph.num_values:
-                values = values[0: daph.num_values - total_seen]
-            vals += [dictionary[v] for v in values]
-            total_seen += len(values)
+        indices = encoding.read_rle_bit_packed_hybrid_batch(
+            raw_bytes, bit_width, num_not_null, io_obj.tell())
+        if not dictionary_converted:
+            dictionary = _convert_dictionary(dictionary, schema_helper,
+                                             column_metadata,
+                                             int96_timestamps,
+                                             converted_types)
+        convert = None
+        if dictionary_codes:
+            vals = columns.DictionaryArray(indices, dictionary)
+        elif isinstance(dictionary, list):
+            vals = [dictionary[v] for v in indices.tolist()]
+        else:
+            vals = dictionary[indices]
+    elif daph.encoding == Encoding.DELTA_LENGTH_BYTE_ARRAY and binary_arrays:
+        vals = encoding.read_delta_length_byte_array_batch(
+            raw_bytes, io_obj.tell())[0]
+    elif daph.encoding == Encoding.DELTA_LENGTH_BYTE_ARRAY:
+        vals = encoding.read_delta_length_byte_array(io_obj)
     elif daph.encoding == Encoding.DELTA_BYTE_ARRAY:
         vals = encoding.read_delta_byte_array(io_obj)
     elif daph.encoding == Encoding.DELTA_BINARY_PACKED:
-        vals = encoding.read_delta_binary_packed(io_obj)
+        vals = encoding.read_delta_binary_packed_batch(
+            raw_bytes, io_obj.tell())[0].tolist()
     else:
         raise ParquetFormatException("Unsupported encoding: %s",
                                      _get_name(Encoding, daph.encoding))
+    if convert is not None:
+        vals = convert(vals)
+    if nullable:
+        vals = columns.NullableArray(vals, valid, num_nulls)
     return (repetition_levels, definition_levels, vals)
 
+def _convert_dictionary(dictionary, schema_helper, column_metadata,
+                        int96_timestamps=False, converted_types=False):
+    """Converts the decoded dictionary of a column chunk the way
+    _decode_data_page converts the values of its pages, returning a new
+    dictionary (the one passed in may be shared through cache.page_cache)."""
+    if int96_timestamps and column_metadata.type == Type.INT96:
+        return encoding.int96_values_to_timestamps(dictionary)
+    if converted_types:
+        convert = converters.converter(schema_helper.schema_element(
+            '.'.join(column_metadata.path_in_schema)))
+        if convert is not None:
+            return convert(dictionary)
+    return dictionary
+
+def _read_data_page(fo, schema_helper, page_header, column_metadata,
+                    dictionary, nullable=False):
+    raw_bytes = _read_page(fo, page_header, column_metadata)
+    return _decode_data_page(raw_bytes, schema_helper, page_header,
+                             column_metadata, dictionary, nullable=nullable)
+
 class ColumnReader:
-    def __init__(self, fo, schema_helper, max_def_level, schema_element, column_meta_datas):
+    def __init__(self, fo, schema_helper, max_def_level, schema_element,
+                 column_meta_datas, coalesce=False, chunks=None,
+                 prefetcher=None, workers=None, file_key=None, path=None):
         self._fo = fo
         self._schema_helper = schema_helper
         self._max_def_level = max_def_level
         self._schema_element = schema_element
         self._column_meta_datas = column_meta_datas
+        self._coalesce = coalesce
+        # bytes of each column chunk, if they were already fetched.
+        self._chunks = chunks or [None] * len(column_meta_datas)
+        self._prefetcher = prefetcher
+        self._workers = workers
+        self._file_key = file_key
+        # the dotted schema path of the column.
+        self._path = path
 
-    def read(self):
-        fo = self._fo
+    def read_batches(self, binary_arrays=False, dictionary_codes=False,
+                     nullable=False, int96_timestamps=False,
+                     converted_types=False, typed_arrays=False):
+        """Yields a (repetition levels, definition levels, values) tuple for
+        every data page of the column, where the values are the non-null
+        values of the page. See _decode_data_page for binary_arrays,
+        dictionary_codes, nullable, int96_timestamps, converted_types and
+        typed_arrays."""
         schema_helper = self._schema_helper
-        for cmd in self._column_meta_datas:
-            dict_items = []
-            offset = _get_offset(cmd)
-            self._fo.seek(offset, 0)
-            values_seen = 0
-            logger.debug("reading column chunk of type: %s", _get_name(Type, cmd.type))
-            ph = _read_page_header(fo)
+        current_cmd = None
+        for cmd, ph, page, _ in _read_pages(
+                self._fo, zip(self._column_meta_datas, self._chunks),
+                self._coalesce, self._prefetcher, self._workers,
+                self._file_key):
+            if cmd is not current_cmd:
+                current_cmd = cmd
+                dict_items = []
+                logger.debug("reading column chunk of type: %s", _get_name(Type, cmd.type))
             logger.debug("Reading page (type=%s, "
                          "uncompressed=%s bytes, "
                          "compressed=%s bytes)",
@@ -513,54 +968,141 @@ class ColumnReader:
                          ph.compressed_page_size)
 
             if ph.type == PageType.DATA_PAGE:
-                rls, dls, vals = _read_data_page(fo, schema_helper, ph, cmd,
-                                        dict_items)
-                if self._max_def_level == 0:
-                    for v in vals:
-                        yield (0, 0, v)
-                else:
-                    logger.debug("total repetition_levels:%s, definition_levels:%s,"+
-                                 " values: %s", len(rls), len(dls), len(vals))
-                    ivl = 0
-                    for i, dl in enumerate(dls):
-                        rl = 0
-                        if len(rls) > 0: rl = rls[i]
-                        v = None
-                        if dl < self._max_def_level:
-                            v = [rl, dl, None]
-                        else:
-                            v = [rl, dl, vals[ivl]]
-                            ivl += 1
-                        yield v
+                yield _decode_data_page(page, schema_helper, ph, cmd,
+                                        dict_items, binary_arrays,
+                                        dictionary_codes, nullable,
+                                        int96_timestamps, converted_types,
+                                        dictionary_converted=True,
+                                        typed_arrays=typed_arrays)
             elif ph.type == PageType.DICTIONARY_PAGE:
                 logger.debug(ph)
                 assert dict_items == []
-                dict_items = read_dictionary_page(fo, ph, cmd)
-                logger.debug("Dictionary: %s", str(dict_items))
+                logger.debug("Dictionary: %s", str(page))
+                # converted once here rather than for every data page.
+                dict_items = _convert_dictionary(page, schema_helper, cmd,
+                                                 int96_timestamps,
+                                                 converted_types)
             else:
                 logger.warn("Skipping unknown page type={0}".format(
                             _get_name(PageType, ph.type)))
 
+    def read(self):
+        for rls, dls, vals in self.read_batches(nullable=True):
+            if self._max_def_level == 0:
+                for v in vals.tolist():
+                    yield (0, 0, v)
+            else:
+                logger.debug("total repetition_levels:%s, definition_levels:%s,"+
+                             " values: %s", len(rls), len(dls),
+                             len(vals) - vals.null_count)
+                for v in izip(rls.tolist() or repeat(0), dls.tolist(),
+                              vals.tolist()):
+                    yield list(v)
+
+    def read_lists(self):
+        """Reads a repeated column into a columns.ListArray, with a level
+        of nesting for every repeated field on the path of the column. The
+        levels of all of its pages are converted at once by
+        columns.lists_from_levels rather than record by record."""
+        path = self._path
+        if path is None:
+            path = '.'.join(self._column_meta_datas[0].path_in_schema)
+        repeated_definition_levels = \
+            self._schema_helper.repeated_definition_levels(path)
+        if not repeated_definition_levels:
+            raise ValueError(
+                "{0} is not a repeated column, use read() instead".format(
+                    path))
+        rls, dls, vals = [], [], []
+        for page_rls, page_dls, page_vals in self.read_batches():
+            rls.append(page_rls)
+            dls.append(page_dls)
+            vals.append(page_vals)
+        return columns.lists_from_levels(
+            columns.concatenate_levels(rls), columns.concatenate_levels(dls),
+            repeated_definition_levels, self._max_def_level,
+            list(chain.from_iterable(vals)))
+
 class FileReader:
-    def __init__(self, fo):
+    def __init__(self, fo, tail_size=None, lazy=False, coalesce=False,
+                 memory_map=False, prefetcher=None, workers=None,
+                 page_cache=False):
         self._fo = fo
-        self._footer = _read_footer(fo)
-        self._schema_helper = schema.SchemaHelper(self._footer.schema)
+        self._coalesce = coalesce
+        # A prefetch.Prefetcher used by every ColumnReader to read its pages
+        # ahead in a background thread.
+        self._prefetcher = prefetcher
+        # A parallel.WorkerPool used by every ColumnReader to decompress
+        # pages on several cores.
+        self._workers = workers
+        # With page_cache, decompressed pages and decoded dictionaries are
+        # kept in cache.page_cache under this key plus their offset.
+        self._file_key = _file_key(fo) if page_cache else None
+        # ColumnReaders each get a Cursor over this, so they can be read
+        # interleaved (or from several threads) over the one file handle.
+        self._source = PositionalFile(fo)
+        entry = _read_footer_entry(fo, tail_size, lazy=lazy)
+        self._footer = entry.footer
+        self._schema_helper = entry.schema_helper
+        self._index = entry.index
+        # With memory_map, pages are decoded (and decompressed) straight
+        # from zero-copy slices of the mapping rather than read from fo. The
+        # file is only mapped once its footer has been read successfully.
+        self._mapping = _map_file(fo) if memory_map else None
+
+    def close(self):
+        """Releases the memory mapping of a reader created with memory_map.
+        The file object itself is left open, and ColumnReaders of the reader
+        must not be used after it's closed."""
+        if self._mapping is not None:
+            self._mapping.close()
+            self._mapping = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
 
     def schema(self):
         return self._footer.schema
 
-    def column_reader(self, column_name):
-        column_meta_datas = []
-        for rg in self._footer.row_groups:
-            for idx, cg in enumerate(rg. columns):
-                cmd = cg.meta_data
-                if not ".".join(cmd.path_in_schema) == column_name:
-                    continue
-                column_meta_datas.append(cmd)
+    def column_reader(self, column_name, chunks=None):
+        column = self._index.column(column_name)
+        column_meta_datas = [self._index.column_metadata(rg_idx, column)
+                             for rg_idx in range(self._index.num_row_groups)]
+        if chunks is None and self._mapping is not None:
+            chunks = [buffer(self._mapping, _get_offset(cmd))
+                      for cmd in column_meta_datas]
         schema_element = self._schema_helper.schema_element(column_name)
-        rd = ColumnReader(self._fo, self._schema_helper,
+        rd = ColumnReader(Cursor(self._source), self._schema_helper,
                 self._schema_helper.max_definition_level(column_name),
                 schema_element,
-                column_meta_datas)
+                column_meta_datas,
+                coalesce=self._coalesce,
+                chunks=chunks,
+                prefetcher=self._prefetcher,
+                workers=self._workers,
+                file_key=self._file_key,
+                path=column_name)
         return rd
+
+    def column_readers(self, column_names, planner=None):
+        """Returns a dict of column name to ColumnReader for the given
+        columns. The chunks of all of the columns are fetched up front by the
+        given planner.IOPlanner, which merges chunks that are close together
+        on disk into larger reads."""
+        if planner is None:
+            planner = IOPlanner()
+        index = self._index
+        columns = [index.column(name) for name in column_names]
+        ranges = []
+        for rg_idx in range(index.num_row_groups):
+            for column in columns:
+                offset, size, _, _ = index.chunk(rg_idx, column)
+                ranges.append(((rg_idx, column), offset, size))
+        chunks = planner.fetch(Cursor(self._source), ranges)
+        return dict((name, self.column_reader(
+            name, [chunks[(rg_idx, column)]
+                   for rg_idx in range(index.num_row_groups)]))
+            for name, column in zip(column_names, columns))
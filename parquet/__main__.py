@@ -34,6 +34,16 @@ def main(argv=None):
                              'format=csv)')
     parser.add_argument('--format', action='store', type=str, default='csv',
                         help='format for the output data. can be csv or json.')
+    parser.add_argument('--coalesce', action='store_true',
+                        help='read each column chunk with a single I/O')
+    parser.add_argument('--memory-map', action='store_true',
+                        help='memory map the file instead of reading it')
+    parser.add_argument('--prefetch', action='store', type=int, default=0,
+                        metavar='DEPTH',
+                        help='read up to DEPTH pages ahead in a background '
+                             'thread')
+    parser.add_argument('--workers', action='store', type=int, default=0,
+                        help='decompress pages on this many threads')
     parser.add_argument('--debug', action='store_true',
                         help='log debug info to stderr')
     parser.add_argument('file',
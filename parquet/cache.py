@@ -0,0 +1,123 @@
+"""Process-wide caches for decoded parquet metadata and pages."""
+
+import collections
+import sys
+import threading
+
+# Lists longer than this are measured by approximate_size from a sample of
+# their items.
+SIZE_SAMPLE = 16
+
+
+class LRUCache(object):
+    """A thread-safe least-recently-used cache bounded both by the number of
+    entries and by the approximate size in bytes of the cached values.
+
+    The size of each value is supplied by the caller when it is added. Hits,
+    misses and evictions are counted and can be inspected with stats()."""
+
+    def __init__(self, max_entries, max_bytes):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        """Returns the value cached for key, or None if there is none."""
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries[key] = entry  # re-insert as most recently used
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, value, size):
+        """Adds value to the cache under key, evicting the least recently
+        used entries until the cache is back within its bounds. Values larger
+        than max_bytes are not cached."""
+        if size > self.max_bytes or self.max_entries <= 0:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old[1]
+            self._entries[key] = (value, size)
+            self._bytes += size
+            while len(self._entries) > self.max_entries or \
+                    self._bytes > self.max_bytes:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+                self.evictions += 1
+
+    def clear(self):
+        """Removes all entries and resets the counters."""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+            self.hits = 0
+            self.misses = 0
+            self.evictions = 0
+
+    def stats(self):
+        """Returns a dict with the hit/miss/eviction counters and the current
+        number of entries and bytes."""
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+            }
+
+    def __len__(self):
+        return len(self._entries)
+
+
+def approximate_size(obj, _seen=None):
+    """Returns an estimate of the memory taken up by obj and the objects it
+    refers to, adding up sys.getsizeof over its lists, tuples, dicts and
+    instance attributes. Objects referred to more than once are counted
+    once. Only SIZE_SAMPLE evenly spaced items of longer lists and tuples
+    are measured, and the others are assumed to be of the same average
+    size, so that wide footers are measured quickly."""
+    if _seen is None:
+        _seen = set()
+    if id(obj) in _seen:
+        return 0
+    _seen.add(id(obj))
+    size = sys.getsizeof(obj)
+    if isinstance(obj, (list, tuple)):
+        if len(obj) > SIZE_SAMPLE:
+            step = len(obj) / float(SIZE_SAMPLE)
+            sample = [obj[int(i * step)] for i in xrange(SIZE_SAMPLE)]
+            measured = sum(approximate_size(item, _seen) for item in sample)
+            return size + int(measured * len(obj) / float(SIZE_SAMPLE))
+        return size + sum(approximate_size(item, _seen) for item in obj)
+    if isinstance(obj, dict):
+        return size + sum(approximate_size(k, _seen) +
+                          approximate_size(v, _seen)
+                          for k, v in obj.iteritems())
+    attributes = getattr(obj, '__dict__', None)
+    if attributes is not None:
+        size += approximate_size(attributes, _seen)
+    return size
+
+
+# metadata.FooterEntry objects (decoded footers and the indexes built from
+# them) keyed by (path, size, mtime, lazy), measured with approximate_size
+# when they're added. The cached objects are shared between readers and
+# must not be modified.
+footer_cache = LRUCache(max_entries=256, max_bytes=64 * 1024 * 1024)
+
+# Decompressed data pages and decoded dictionaries keyed by (path, size,
+# mtime, page offset), used by readers created with page_cache=True. Pages
+# are measured by their uncompressed size and dictionaries by the memory
+# taken up by their values. Cached dictionaries must not be modified.
+page_cache = LRUCache(max_entries=64 * 1024, max_bytes=256 * 1024 * 1024)
@@ -0,0 +1,451 @@
+"""Columnar containers for decoded values.
+
+The readers normally hand back a python object per value. The containers
+here keep a page worth of values in a few flat buffers instead, which saves
+allocating (and later collecting) millions of small objects and lets
+filters run over whole pages at a time. numpy is used when it's available;
+without it, the buffers are array.arrays."""
+
+import array
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+def _typecode(itemsize, typecodes):
+    """Returns the first of the array typecodes with the given itemsize, or
+    None if there is none."""
+    for typecode in typecodes:
+        try:
+            if array.array(typecode).itemsize == itemsize:
+                return typecode
+        except ValueError:  # 'q' is not available on python 2
+            pass
+    return None
+
+
+# array typecodes for 32 and 64-bit ints. There is no 64-bit one on
+# python 2 where a C long is 4 bytes (e.g. windows), see int64_typecode.
+INT32_TYPECODE = _typecode(4, 'il')
+INT64_TYPECODE = _typecode(8, 'ql')
+
+
+def int64_typecode():
+    """Returns INT64_TYPECODE, raising NotImplementedError if 64-bit ints
+    can't be kept in an array.array on this platform (numpy is needed)."""
+    if INT64_TYPECODE is None:
+        raise NotImplementedError(
+            "64-bit int arrays need numpy on this platform")
+    return INT64_TYPECODE
+
+
+def _to_str(data, start, end):
+    """Returns data[start:end] of a str, buffer or memoryview as a str."""
+    chunk = data[start:end]
+    if isinstance(chunk, memoryview):
+        chunk = chunk.tobytes()
+    return chunk
+
+
+def _as_uint8(data):
+    """Returns a zero-copy uint8 numpy array over a str, buffer or
+    memoryview."""
+    if isinstance(data, memoryview):
+        return numpy.asarray(data)
+    return numpy.frombuffer(data, numpy.uint8)
+
+
+class BinaryArray(object):
+    """A column of byte strings kept as one contiguous data buffer (a str,
+    buffer or memoryview) and an array of len + 1 offsets into it: value i
+    is data[offsets[i]:offsets[i + 1]]. Values are only turned into strs
+    when they are accessed."""
+
+    def __init__(self, data, offsets):
+        self.data = data
+        self.offsets = offsets
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, idx):
+        if idx < 0:
+            idx += len(self)
+        if not 0 <= idx < len(self):
+            raise IndexError("BinaryArray index out of range")
+        return _to_str(self.data, int(self.offsets[idx]),
+                       int(self.offsets[idx + 1]))
+
+    def __iter__(self):
+        return iter(self.tolist())
+
+    def __eq__(self, other):
+        if isinstance(other, BinaryArray):
+            return self.tolist() == other.tolist()
+        return self.tolist() == other
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __repr__(self):
+        return "BinaryArray({0!r})".format(self.tolist())
+
+    def __reduce__(self):
+        # only the bytes of the values are pickled, with offsets from 0.
+        start, end = int(self.offsets[0]), int(self.offsets[-1])
+        if numpy is not None:
+            offsets = numpy.asarray(self.offsets) - start
+        else:
+            offsets = array.array(self.offsets.typecode,
+                                  [o - start for o in self.offsets])
+        return BinaryArray, (_to_str(self.data, start, end), offsets)
+
+    def lengths(self):
+        """Returns the length of every value."""
+        if numpy is not None:
+            return numpy.diff(numpy.asarray(self.offsets))
+        offsets = self.offsets
+        return [offsets[i + 1] - offsets[i] for i in xrange(len(self))]
+
+    def tolist(self):
+        """Returns the values as a list of strs."""
+        offsets = self.offsets.tolist()
+        data = self.data
+        if isinstance(data, memoryview):
+            return [data[offsets[i]:offsets[i + 1]].tobytes()
+                    for i in xrange(len(offsets) - 1)]
+        return [data[offsets[i]:offsets[i + 1]]
+                for i in xrange(len(offsets) - 1)]
+
+    def _match(self, value, exact):
+        n = len(value)
+        if numpy is None:
+            offsets = self.offsets
+            return [(offsets[i + 1] - offsets[i] == n if exact else
+                     offsets[i + 1] - offsets[i] >= n) and
+                    _to_str(self.data, offsets[i], offsets[i] + n) == value
+                    for i in xrange(len(self))]
+        offsets = numpy.asarray(self.offsets)
+        starts = offsets[:-1]
+        lengths = offsets[1:] - starts
+        result = lengths == n if exact else lengths >= n
+        candidates = numpy.flatnonzero(result)
+        if n and len(candidates):
+            window = _as_uint8(self.data)[
+                starts[candidates][:, numpy.newaxis] + numpy.arange(n)]
+            result[candidates] = (
+                window == numpy.frombuffer(value, numpy.uint8)).all(axis=1)
+        return result
+
+    def equals(self, value):
+        """Returns a boolean array (a list without numpy) telling which of
+        the values are equal to the str value."""
+        return self._match(value, True)
+
+    def startswith(self, prefix):
+        """Returns a boolean array (a list without numpy) telling which of
+        the values start with the str prefix."""
+        return self._match(prefix, False)
+
+
+def _narrow_codes(codes, size):
+    """Returns the dictionary indices codes in the smallest unsigned integer
+    type able to index a dictionary of size values."""
+    if numpy is not None:
+        dtype = numpy.min_scalar_type(max(size - 1, 0))
+        return numpy.asarray(codes).astype(dtype, copy=False)
+    typecode = 'B' if size <= 1 << 8 else 'H' if size <= 1 << 16 else 'i'
+    if isinstance(codes, array.array) and codes.typecode == typecode:
+        return codes
+    return array.array(typecode, codes)
+
+
+class DictionaryArray(object):
+    """A dictionary encoded column: the values are dictionary[codes[i]]. The
+    codes are kept in the narrowest unsigned type that can index the
+    dictionary (one byte per value for up to 256 distinct values), and the
+    values are only looked up when they are accessed.
+
+    The dictionary is the decoded dictionary page of the column chunk, which
+    is shared with every other page of the chunk and must not be modified."""
+
+    def __init__(self, codes, dictionary):
+        self.codes = _narrow_codes(codes, len(dictionary))
+        self.dictionary = dictionary
+
+    def __len__(self):
+        return len(self.codes)
+
+    def __getitem__(self, idx):
+        return self.dictionary[self.codes[idx]]
+
+    def __iter__(self):
+        return iter(self.tolist())
+
+    def __eq__(self, other):
+        if isinstance(other, DictionaryArray):
+            return self.tolist() == other.tolist()
+        return self.tolist() == other
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __repr__(self):
+        return "DictionaryArray({0!r})".format(self.tolist())
+
+    def tolist(self):
+        """Returns the values as a list, looking up every code."""
+        dictionary = self.dictionary
+        return [dictionary[c] for c in self.codes.tolist()]
+
+    def equals(self, value):
+        """Returns a boolean array (a list without numpy) telling which of
+        the values are equal to value. The value is looked up in the
+        dictionary once, and then only the codes are compared."""
+        codes = [c for c, v in enumerate(self.dictionary) if v == value]
+        if numpy is not None:
+            return numpy.in1d(self.codes, codes)
+        codes = set(codes)
+        return [c in codes for c in self.codes]
+
+
+def validity(levels, max_level, run_value=None, count=None):
+    """Returns a (valid, null_count) tuple for the definition levels of a
+    page, where valid is a boolean array (a list without numpy) telling
+    which values are defined, i.e. have the level max_level. valid is None
+    if no value is null.
+
+    run_value is the level shared by all of the count levels if the page
+    stores them as a single rle run (see encoding.rle_run_value), in which
+    case the levels aren't looked at at all and may be None."""
+    if run_value is not None:
+        if run_value == max_level:
+            return None, 0
+        if count is None:
+            count = len(levels)
+        if numpy is not None:
+            return numpy.zeros(count, numpy.bool_), count
+        return [False] * count, count
+    if numpy is not None:
+        valid = numpy.asarray(levels) == max_level
+        null_count = len(valid) - int(numpy.count_nonzero(valid))
+    else:
+        valid = [level == max_level for level in levels]
+        null_count = valid.count(False)
+    if null_count == 0:
+        return None, 0
+    return valid, null_count
+
+
+def _values_list(values):
+    """Returns a page of values (a list or any of the arrays above) as a
+    list. The rows of a (count, type_length) uint8 numpy array of
+    FIXED_LEN_BYTE_ARRAY values become strs."""
+    if isinstance(values, list):
+        return values
+    if numpy is not None and isinstance(values, numpy.ndarray) and \
+            values.ndim == 2:
+        length = values.shape[1]
+        if length == 0:
+            return [""] * len(values)
+        data = values.tostring()
+        return [data[i:i + length] for i in xrange(0, len(data), length)]
+    return values.tolist()
+
+
+class NullableArray(object):
+    """A page of a nullable column: the non-null values (a list or any of
+    the arrays above) and a validity mask with an entry for every value,
+    which is None if none of them is null."""
+
+    def __init__(self, values, valid=None, null_count=0):
+        self.values = values
+        self.valid = valid
+        self.null_count = null_count
+
+    def __len__(self):
+        if self.valid is None:
+            return len(self.values)
+        return len(self.valid)
+
+    def __iter__(self):
+        return iter(self.tolist())
+
+    def __eq__(self, other):
+        if isinstance(other, NullableArray):
+            return self.tolist() == other.tolist()
+        return self.tolist() == other
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __repr__(self):
+        return "NullableArray({0!r})".format(self.tolist())
+
+    def tolist(self):
+        """Returns the values as a list, with None for the null values."""
+        values = _values_list(self.values)
+        valid = self.valid
+        if valid is None:
+            return values
+        if self.null_count == len(valid):
+            return [None] * len(valid)
+        if numpy is not None:
+            # scatter the values in one step; they are copied into an object
+            # array first so that numpy doesn't try to convert them.
+            objects = numpy.empty(len(values), object)
+            objects[:] = values
+            out = numpy.empty(len(valid), object)
+            out[numpy.asarray(valid)] = objects
+            return out.tolist()
+        values = iter(values)
+        return [next(values) if v else None for v in valid]
+
+    def to_masked(self):
+        """Returns the values as a numpy.ma.MaskedArray, with the null
+        values masked. Only supported for values in a numpy array."""
+        values = numpy.asarray(self.values)
+        if self.valid is None:
+            return numpy.ma.MaskedArray(values)
+        valid = numpy.asarray(self.valid)
+        out = numpy.zeros((len(valid),) + values.shape[1:], values.dtype)
+        out[valid] = values
+        # the rows of FIXED_LEN_BYTE_ARRAY values are masked as a whole.
+        mask = numpy.empty(out.shape, bool)
+        mask[...] = (~valid).reshape((-1,) + (1,) * (out.ndim - 1))
+        return numpy.ma.MaskedArray(out, mask=mask)
+
+
+def list_offsets(repetition_levels, definition_levels,
+                 repeated_definition_levels):
+    """Converts the repetition and definition levels of a column into the
+    layout of its lists: a (offsets, valid) tuple for every repeated field on
+    the path of the column (see schema.SchemaHelper.
+    repeated_definition_levels), outermost first.
+
+    The lists at depth k are the elements of the lists at depth k - 1 (the
+    records for k = 1), and list j holds the elements offsets[j] up to
+    offsets[j + 1] at depth k + 1 (of the leaf values, for the innermost
+    lists). valid tells which lists are defined rather than null, because
+    an optional field between two repeated fields wasn't, and is None if
+    all of them are.
+
+    A level starts a list at depth k if it repeats at a level below k and
+    defines the element at depth k - 1, and adds an element to that list if
+    it repeats at a level of at most k and defines the repeated field at
+    depth k. Both are computed for all levels at once."""
+    result = []
+    parent_level = 0
+    if numpy is not None:
+        rls = numpy.asarray(repetition_levels)
+        dls = numpy.asarray(definition_levels)
+        for depth, level in enumerate(repeated_definition_levels, 1):
+            starts = (rls < depth) & (dls >= parent_level)
+            elements = (rls <= depth) & (dls >= level)
+            counts = numpy.cumsum(elements, dtype=numpy.int64)
+            offsets = numpy.empty(numpy.count_nonzero(starts) + 1,
+                                  numpy.int64)
+            offsets[:-1] = (counts - elements)[starts]
+            offsets[-1] = counts[-1] if len(counts) else 0
+            valid = None
+            if level - 1 > parent_level:
+                valid = dls[starts] >= level - 1
+                if valid.all():
+                    valid = None
+            result.append((offsets, valid))
+            parent_level = level
+        return result
+    levels = zip(repetition_levels, definition_levels)
+    for depth, level in enumerate(repeated_definition_levels, 1):
+        offsets = array.array('l')
+        valid = []
+        count = 0
+        for rl, dl in levels:
+            if rl < depth and dl >= parent_level:
+                offsets.append(count)
+                valid.append(dl >= level - 1)
+            if rl <= depth and dl >= level:
+                count += 1
+        offsets.append(count)
+        if all(valid):
+            valid = None
+        result.append((offsets, valid))
+        parent_level = level
+    return result
+
+
+class ListArray(object):
+    """A column of lists: list j is values[offsets[j]:offsets[j + 1]], or
+    None where valid is False (valid is None if no list is null). The values
+    are another ListArray for nested lists."""
+
+    def __init__(self, offsets, valid, values):
+        self.offsets = offsets
+        self.valid = valid
+        self.values = values
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __iter__(self):
+        return iter(self.tolist())
+
+    def __eq__(self, other):
+        if isinstance(other, ListArray):
+            return self.tolist() == other.tolist()
+        return self.tolist() == other
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __repr__(self):
+        return "ListArray({0!r})".format(self.tolist())
+
+    def tolist(self):
+        """Returns the lists as (nested) python lists."""
+        values = _values_list(self.values)
+        offsets = self.offsets.tolist()
+        lists = [values[offsets[j]:offsets[j + 1]]
+                 for j in xrange(len(offsets) - 1)]
+        if self.valid is not None:
+            lists = [l if v else None for l, v in zip(lists, self.valid)]
+        return lists
+
+
+def concatenate_levels(pages):
+    """Joins the repetition or definition levels of several pages into a
+    single int64 numpy array (an array.array without numpy)."""
+    if numpy is not None:
+        if not pages:
+            return numpy.empty(0, numpy.int64)
+        return numpy.concatenate(pages).astype(numpy.int64, copy=False)
+    levels = array.array('l')
+    for page in pages:
+        levels.extend(page)
+    return levels
+
+
+def lists_from_levels(repetition_levels, definition_levels,
+                      repeated_definition_levels, max_definition_level,
+                      values):
+    """Assembles the non-null values of a repeated column and its levels
+    into a ListArray, with a level of nesting for every repeated field on
+    its path (see list_offsets). The innermost lists hold a NullableArray of
+    the leaf values."""
+    if not repeated_definition_levels:
+        raise ValueError("A column without repeated fields has no lists")
+    leaf_level = repeated_definition_levels[-1]
+    if numpy is not None:
+        dls = numpy.asarray(definition_levels)
+        entries = dls[dls >= leaf_level]
+    else:
+        entries = [dl for dl in definition_levels if dl >= leaf_level]
+    valid, null_count = validity(entries, max_definition_level)
+    column = NullableArray(values, valid, null_count)
+    for offsets, valid in reversed(list_offsets(
+            repetition_levels, definition_levels,
+            repeated_definition_levels)):
+        column = ListArray(offsets, valid, column)
+    return column
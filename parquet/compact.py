@@ -0,0 +1,263 @@
+"""Low level helpers for the thrift compact protocol that work directly on a
+byte buffer and an offset, rather than going through a thrift transport.
+
+Every reader takes the buffer (a str or memoryview) and the position to
+start at and returns the decoded value along with the position just past
+it. Reading past the end of the buffer raises IndexError.
+
+read_struct decodes any of the generated ttypes structs (FileMetaData,
+PageHeader, ...) using per-class field tables built from their thrift_spec,
+which is much cheaper than TCompactProtocol with its transport and per-call
+state checks."""
+
+import struct
+
+from thrift.Thrift import TType
+
+CT_STOP = 0x00
+CT_BOOLEAN_TRUE = 0x01
+CT_BOOLEAN_FALSE = 0x02
+CT_BYTE = 0x03
+CT_I16 = 0x04
+CT_I32 = 0x05
+CT_I64 = 0x06
+CT_DOUBLE = 0x07
+CT_BINARY = 0x08
+CT_LIST = 0x09
+CT_SET = 0x0A
+CT_MAP = 0x0B
+CT_STRUCT = 0x0C
+
+
+def read_varint(buf, pos):
+    """Reads an unsigned LEB128 varint."""
+    result = 0
+    shift = 0
+    while True:
+        byte = ord(buf[pos])
+        pos += 1
+        result |= (byte & 0x7F) << shift
+        if not byte & 0x80:
+            return result, pos
+        shift += 7
+
+
+def read_zigzag(buf, pos):
+    """Reads a zigzag encoded varint, as used for i16, i32 and i64."""
+    n, pos = read_varint(buf, pos)
+    return (n >> 1) ^ -(n & 1), pos
+
+
+def read_binary(buf, pos):
+    """Reads a length-prefixed binary/string value."""
+    length, pos = read_varint(buf, pos)
+    end = pos + length
+    if end > len(buf):
+        raise IndexError("binary value extends past the end of the buffer")
+    value = buf[pos:end]
+    if isinstance(value, memoryview):
+        value = value.tobytes()
+    return value, end
+
+
+def read_byte(buf, pos):
+    """Reads a signed byte."""
+    value = ord(buf[pos])
+    return value - 256 if value > 127 else value, pos + 1
+
+
+def read_double(buf, pos):
+    """Reads a little endian double."""
+    if pos + 8 > len(buf):
+        raise IndexError("double extends past the end of the buffer")
+    return struct.unpack_from("<d", buf, pos)[0], pos + 8
+
+
+def read_field_header(buf, pos, last_fid):
+    """Reads a struct field header, returning (field id, compact type, pos).
+    The compact type is CT_STOP at the end of the struct."""
+    byte = ord(buf[pos])
+    pos += 1
+    ctype = byte & 0x0F
+    if ctype == CT_STOP:
+        return 0, CT_STOP, pos
+    delta = byte >> 4
+    if delta:
+        return last_fid + delta, ctype, pos
+    fid, pos = read_zigzag(buf, pos)
+    return fid, ctype, pos
+
+
+def read_collection_header(buf, pos):
+    """Reads a list/set header, returning (size, element type, pos)."""
+    byte = ord(buf[pos])
+    pos += 1
+    size = byte >> 4
+    if size == 15:
+        size, pos = read_varint(buf, pos)
+    return size, byte & 0x0F, pos
+
+
+def _skip_varint(buf, pos):
+    while ord(buf[pos]) & 0x80:
+        pos += 1
+    return pos + 1
+
+
+def skip(buf, pos, ctype):
+    """Skips over a value of the given compact type that was introduced by a
+    field header (booleans are stored in the header itself and take no
+    bytes) and returns the position just past it."""
+    if ctype in (CT_BOOLEAN_TRUE, CT_BOOLEAN_FALSE):
+        return pos
+    return _skip_element(buf, pos, ctype)
+
+
+def _skip_element(buf, pos, ctype):
+    """Skips a value of the given compact type as it is stored inside a
+    collection, where booleans take up a byte."""
+    if ctype in (CT_I16, CT_I32, CT_I64):
+        return _skip_varint(buf, pos)
+    if ctype == CT_BINARY:
+        length, pos = read_varint(buf, pos)
+        return pos + length
+    if ctype == CT_STRUCT:
+        fid = 0
+        while True:
+            fid, ftype, pos = read_field_header(buf, pos, fid)
+            if ftype == CT_STOP:
+                return pos
+            pos = skip(buf, pos, ftype)
+    if ctype in (CT_LIST, CT_SET):
+        size, etype, pos = read_collection_header(buf, pos)
+        for _ in xrange(size):
+            pos = _skip_element(buf, pos, etype)
+        return pos
+    if ctype == CT_MAP:
+        size, pos = read_varint(buf, pos)
+        if size == 0:
+            return pos
+        types = ord(buf[pos])
+        pos += 1
+        for _ in xrange(size):
+            pos = _skip_element(buf, pos, types >> 4)
+            pos = _skip_element(buf, pos, types & 0x0F)
+        return pos
+    if ctype in (CT_BOOLEAN_TRUE, CT_BOOLEAN_FALSE, CT_BYTE):
+        return pos + 1
+    if ctype == CT_DOUBLE:
+        return pos + 8
+    raise ValueError("Unknown compact type: {0}".format(ctype))
+
+
+# Maps a thrift TType to the compact type it is written as.
+_COMPACT_TYPES = {
+    TType.BOOL: CT_BOOLEAN_TRUE,
+    TType.BYTE: CT_BYTE,
+    TType.I16: CT_I16,
+    TType.I32: CT_I32,
+    TType.I64: CT_I64,
+    TType.DOUBLE: CT_DOUBLE,
+    TType.STRING: CT_BINARY,
+    TType.LIST: CT_LIST,
+    TType.SET: CT_SET,
+    TType.MAP: CT_MAP,
+    TType.STRUCT: CT_STRUCT,
+}
+
+
+def _read_bool_element(buf, pos):
+    return ord(buf[pos]) == CT_BOOLEAN_TRUE, pos + 1
+
+
+def _reader(ttype, args):
+    """Returns a function (buf, pos) -> (value, pos) reading a value of the
+    given thrift type. args is the type argument from a thrift_spec."""
+    if ttype in (TType.I16, TType.I32, TType.I64):
+        return read_zigzag
+    if ttype == TType.STRING:
+        return read_binary
+    if ttype == TType.STRUCT:
+        cls = args[0]
+        return lambda buf, pos: read_struct(buf, pos, cls)
+    if ttype in (TType.LIST, TType.SET):
+        read_element = _reader(args[0], args[1])
+        container = list if ttype == TType.LIST else set
+
+        def read_collection(buf, pos):
+            size, _, pos = read_collection_header(buf, pos)
+            values = []
+            for _ in xrange(size):
+                value, pos = read_element(buf, pos)
+                values.append(value)
+            return container(values), pos
+        return read_collection
+    if ttype == TType.MAP:
+        read_key = _reader(args[0], args[1])
+        read_value = _reader(args[2], args[3])
+
+        def read_map(buf, pos):
+            size, pos = read_varint(buf, pos)
+            values = {}
+            if size:
+                pos += 1  # key and value types
+            for _ in xrange(size):
+                key, pos = read_key(buf, pos)
+                values[key], pos = read_value(buf, pos)
+            return values, pos
+        return read_map
+    if ttype == TType.BOOL:
+        return _read_bool_element
+    if ttype == TType.BYTE:
+        return read_byte
+    if ttype == TType.DOUBLE:
+        return read_double
+    raise ValueError("Unsupported thrift type: {0}".format(ttype))
+
+
+_FIELD_TABLES = {}
+
+
+def _field_table(cls):
+    """Returns the {field id: (name, compact type, reader)} table for the
+    given generated thrift class."""
+    table = _FIELD_TABLES.get(cls)
+    if table is None:
+        table = {}
+        for spec in cls.thrift_spec:
+            if spec is None:
+                continue
+            fid, ttype, name, args, _ = spec
+            table[fid] = (name, _COMPACT_TYPES[ttype], _reader(ttype, args))
+        _FIELD_TABLES[cls] = table
+    return table
+
+
+def read_struct(buf, pos, cls):
+    """Reads an instance of the generated thrift struct cls. Unknown fields,
+    and fields whose type doesn't match the spec, are skipped."""
+    table = _field_table(cls)
+    obj = cls()
+    fid = 0
+    while True:
+        byte = ord(buf[pos])
+        pos += 1
+        ctype = byte & 0x0F
+        if ctype == CT_STOP:
+            return obj, pos
+        delta = byte >> 4
+        if delta:
+            fid += delta
+        else:
+            fid, pos = read_zigzag(buf, pos)
+        field = table.get(fid)
+        if ctype == CT_BOOLEAN_FALSE:
+            if field is not None and field[1] == CT_BOOLEAN_TRUE:
+                setattr(obj, field[0], False)
+        elif field is None or field[1] != ctype:
+            pos = skip(buf, pos, ctype)
+        elif ctype == CT_BOOLEAN_TRUE:
+            setattr(obj, field[0], True)
+        else:
+            value, pos = field[2](buf, pos)
+            setattr(obj, field[0], value)
@@ -0,0 +1,141 @@
+"""Page decompression, by CompressionCodec.
+
+Every codec maps to a function decompress(data, uncompressed_size) that
+returns the uncompressed bytes of a page. data is a str or a buffer object
+and uncompressed_size is the size recorded in the page header, which
+backends use to size their output up front.
+
+GZIP is handled by zlib directly. The other codecs depend on optional
+modules (python-snappy, lz4, zstandard and python-lzo) and are registered
+when they can be imported. Other backends can be plugged in with
+register()."""
+
+import logging
+import struct
+import zlib
+
+from ttypes import CompressionCodec
+
+logger = logging.getLogger("parquet")
+
+# Codecs added to the parquet format after ttypes was generated.
+BROTLI = 4
+LZ4 = 5
+ZSTD = 6
+
+_NAMES = dict(CompressionCodec._VALUES_TO_NAMES)
+_NAMES.update({BROTLI: "BROTLI", LZ4: "LZ4", ZSTD: "ZSTD"})
+
+_DECOMPRESSORS = {}
+
+
+def register(codec, decompress):
+    """Makes decompress(data, uncompressed_size) the decompressor used for
+    pages compressed with codec, replacing any registered before."""
+    _DECOMPRESSORS[codec] = decompress
+
+
+def decompressor(codec):
+    """Returns the decompressor registered for codec, or None."""
+    return _DECOMPRESSORS.get(codec)
+
+
+def codec_name(codec):
+    """Returns the name of the given codec."""
+    return _NAMES.get(codec, str(codec))
+
+
+def _uncompressed(data, uncompressed_size):
+    return data
+
+
+def _gunzip(data, uncompressed_size):
+    # wbits of 16 + MAX_WBITS makes zlib expect a gzip header and trailer.
+    raw_bytes = zlib.decompress(data, 16 + zlib.MAX_WBITS,
+                                max(uncompressed_size, 1))
+    if len(raw_bytes) < uncompressed_size:
+        # zlib.decompress stops after the first of several gzip members.
+        parts = []
+        while data:
+            d = zlib.decompressobj(16 + zlib.MAX_WBITS)
+            parts.append(d.decompress(data))
+            data = d.unused_data
+        raw_bytes = "".join(parts)
+    return raw_bytes
+
+
+def hadoop_framed(decompress_block):
+    """Wraps decompress_block(data, uncompressed_size), which decompresses a
+    single raw block, to read the framing written by the Hadoop codecs
+    (parquet-mr writes LZO this way): a sequence of blocks, each a big
+    endian uncompressed length followed by chunks of a big endian
+    compressed length and the compressed bytes."""
+    def decompress(data, uncompressed_size):
+        parts = []
+        pos = 0
+        while pos < len(data):
+            block_size, = struct.unpack_from(">I", data, pos)
+            pos += 4
+            produced = 0
+            while produced < block_size:
+                chunk_size, = struct.unpack_from(">I", data, pos)
+                pos += 4
+                part = decompress_block(data[pos:pos + chunk_size],
+                                        block_size - produced)
+                pos += chunk_size
+                produced += len(part)
+                parts.append(part)
+        return "".join(parts)
+    return decompress
+
+
+def _is_hadoop_framed(data, uncompressed_size):
+    """Guesses whether a LZ4 page uses the Hadoop framing, which older
+    parquet-mr versions wrote, or is a raw LZ4 block."""
+    if len(data) < 8:
+        return False
+    block_size, chunk_size = struct.unpack_from(">II", data)
+    return block_size <= uncompressed_size and chunk_size <= len(data) - 8
+
+
+register(CompressionCodec.UNCOMPRESSED, _uncompressed)
+register(CompressionCodec.GZIP, _gunzip)
+
+try:
+    import snappy
+    register(CompressionCodec.SNAPPY,
+             lambda data, uncompressed_size: snappy.decompress(data))
+except ImportError:
+    logger.warn(
+        "Couldn't import snappy. Support for snappy compression disabled.")
+
+try:
+    import lzo
+    register(CompressionCodec.LZO, hadoop_framed(
+        lambda data, uncompressed_size: lzo.decompress(
+            data, False, uncompressed_size)))
+except ImportError:
+    pass
+
+try:
+    import lz4.block
+
+    def _lz4_block(data, uncompressed_size):
+        return lz4.block.decompress(data, uncompressed_size=uncompressed_size)
+    _lz4_hadoop = hadoop_framed(_lz4_block)
+
+    def _lz4(data, uncompressed_size):
+        if _is_hadoop_framed(data, uncompressed_size):
+            return _lz4_hadoop(data, uncompressed_size)
+        return _lz4_block(data, uncompressed_size)
+    register(LZ4, _lz4)
+except ImportError:
+    pass
+
+try:
+    import zstandard
+    register(ZSTD, lambda data, uncompressed_size:
+             zstandard.ZstdDecompressor().decompress(
+                 data, max_output_size=uncompressed_size))
+except ImportError:
+    pass
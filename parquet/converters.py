@@ -0,0 +1,182 @@
+"""Conversion of decoded values to their logical types, by the
+converted_type of their SchemaElement.
+
+Every conversion works on a page of values at a time: the arrays returned
+by the batch decoders in parquet.encoding (or plain lists of values, e.g.
+the entries of a dictionary page), and returns the converted page. With
+numpy, DATE and TIMESTAMP columns become datetime64 arrays; all other
+results are lists. DECIMAL columns always become exact decimal.Decimal
+values, unless floats are asked for with decimals_as_float."""
+
+import binascii
+import datetime
+import decimal
+
+from columns import BinaryArray, _as_uint8, _to_str
+from ttypes import ConvertedType, Type
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# Converted types added to the parquet format after ttypes was generated.
+DATE = 6
+TIMESTAMP_MILLIS = 9
+TIMESTAMP_MICROS = 10
+
+_EPOCH = datetime.datetime(1970, 1, 1)
+
+
+def utf8(values):
+    """Decodes a page of UTF8 BYTE_ARRAY values, a columns.BinaryArray or a
+    list of strs, to a list of unicode strings. The bytes of a BinaryArray
+    are decoded in one go when they are all ASCII, which is the common
+    case; other pages are decoded value by value."""
+    if not isinstance(values, BinaryArray):
+        return [v.decode('utf-8') for v in values]
+    offsets = values.offsets.tolist()
+    if not offsets:
+        return []
+    base = offsets[0]
+    try:
+        text = _to_str(values.data, base, offsets[-1]).decode('ascii')
+    except UnicodeDecodeError:
+        return [v.decode('utf-8') for v in values.tolist()]
+    return [text[offsets[i] - base:offsets[i + 1] - base]
+            for i in xrange(len(offsets) - 1)]
+
+
+def _scale(unscaled, scale, as_float):
+    """Returns the unscaled decimal values (an int64 numpy array or a list of
+    ints) divided by 10 ** scale, as a list of decimal.Decimals, or as the
+    nearest floats if as_float is True (a float64 array with numpy)."""
+    if as_float and numpy is not None:
+        return numpy.asarray(unscaled, numpy.float64) / 10.0 ** scale
+    if numpy is not None and isinstance(unscaled, numpy.ndarray):
+        unscaled = unscaled.tolist()
+    if as_float:
+        return [v / 10.0 ** scale for v in unscaled]
+    if not unscaled:
+        return []
+    # scaleb rounds to the precision of its context, which has to hold the
+    # digits of the largest value for the results to be exact.
+    context = decimal.Context(prec=len(str(max(max(unscaled),
+                                               -min(unscaled), 1))))
+    return [decimal.Decimal(v).scaleb(-scale, context) for v in unscaled]
+
+
+def decimal_from_ints(values, scale, as_float=False):
+    """Converts a page of DECIMAL values stored as INT32 or INT64 unscaled
+    values to decimals with the given scale. The results are exact unless
+    as_float is True, see _scale."""
+    return _scale(values, scale or 0, as_float)
+
+
+def _fixed_to_int(value):
+    """Returns the big endian two's complement integer stored in value."""
+    if not value:
+        return 0
+    n = int(binascii.hexlify(value), 16)
+    if ord(value[0]) & 0x80:
+        n -= 1 << (8 * len(value))
+    return n
+
+
+def decimal_from_fixed(values, length, scale, as_float=False):
+    """Converts a page of DECIMAL values stored as big endian two's
+    complement FIXED_LEN_BYTE_ARRAYs of the given length to decimals with
+    the given scale. values is a list of strs, or a (count, length) uint8
+    numpy array. The results are exact unless as_float is True, see
+    _scale.
+
+    With numpy, values of up to 8 bytes are sign extended to 8 bytes all
+    at once and read as big endian int64s."""
+    if numpy is not None and 0 < length <= 8:
+        if isinstance(values, numpy.ndarray):
+            raw = values.reshape(-1, length)
+        else:
+            raw = _as_uint8("".join(values)).reshape(-1, length)
+        padded = numpy.empty((len(raw), 8), numpy.uint8)
+        padded[:, :8 - length] = numpy.where(raw[:, :1] & 0x80, 0xFF, 0)
+        padded[:, 8 - length:] = raw
+        unscaled = padded.view('>i8').reshape(-1).astype(numpy.int64)
+    else:
+        if numpy is not None and isinstance(values, numpy.ndarray):
+            values = [row.tostring() for row in values.reshape(-1, length)]
+        unscaled = [_fixed_to_int(v) for v in values]
+    return _scale(unscaled, scale or 0, as_float)
+
+
+def _datetimes(values, unit, to_python):
+    if numpy is not None:
+        return numpy.array(values, numpy.int64).view(
+            'datetime64[{0}]'.format(unit))
+    return [to_python(v) for v in values]
+
+
+def dates(values):
+    """Converts a page of DATE values, the number of days since the epoch,
+    to a datetime64[D] numpy array (a list of datetime.dates without
+    numpy)."""
+    epoch = _EPOCH.date().toordinal()
+    return _datetimes(values, 'D',
+                      lambda v: datetime.date.fromordinal(epoch + v))
+
+
+def timestamps_millis(values):
+    """Converts a page of TIMESTAMP_MILLIS values to a datetime64[ms] numpy
+    array (a list of naive UTC datetime.datetimes without numpy)."""
+    return _datetimes(values, 'ms',
+                      lambda v: _EPOCH + datetime.timedelta(milliseconds=v))
+
+
+def timestamps_micros(values):
+    """Converts a page of TIMESTAMP_MICROS values to a datetime64[us] numpy
+    array (a list of naive UTC datetime.datetimes without numpy)."""
+    return _datetimes(values, 'us',
+                      lambda v: _EPOCH + datetime.timedelta(microseconds=v))
+
+
+def _decimal(schema_element, decimals_as_float):
+    if schema_element.type == Type.FIXED_LEN_BYTE_ARRAY:
+        return lambda values: decimal_from_fixed(
+            values, schema_element.type_length, schema_element.scale,
+            decimals_as_float)
+    return lambda values: decimal_from_ints(
+        values, schema_element.scale, decimals_as_float)
+
+
+# (converted type, physical type) to a function returning the conversion
+# for a SchemaElement, given the decimals_as_float flag of converter.
+_CONVERTERS = {
+    (ConvertedType.UTF8, Type.BYTE_ARRAY): lambda se, f: utf8,
+    (ConvertedType.DECIMAL, Type.INT32): _decimal,
+    (ConvertedType.DECIMAL, Type.INT64): _decimal,
+    (ConvertedType.DECIMAL, Type.FIXED_LEN_BYTE_ARRAY): _decimal,
+    (DATE, Type.INT32): lambda se, f: dates,
+    (TIMESTAMP_MILLIS, Type.INT64): lambda se, f: timestamps_millis,
+    (TIMESTAMP_MICROS, Type.INT64): lambda se, f: timestamps_micros,
+}
+
+
+def converter(schema_element, decimals_as_float=False):
+    """Returns the function converting a page of values of the column
+    described by schema_element, or None if its values need no conversion
+    (or one that isn't supported). If decimals_as_float is True, DECIMAL
+    values are converted to the nearest floats, which is faster but loses
+    precision, rather than to decimal.Decimals."""
+    make = _CONVERTERS.get((schema_element.converted_type,
+                            schema_element.type))
+    if make is None:
+        return None
+    return make(schema_element, decimals_as_float)
+
+
+def convert(values, schema_element, decimals_as_float=False):
+    """Converts a page of values of the column described by schema_element
+    to their logical type, see converter."""
+    conv = converter(schema_element, decimals_as_float)
+    if conv is None:
+        return values
+    return conv(values)
@@ -4,16 +4,20 @@ import struct
 import cStringIO
 import logging
 import binascii
+import sys
 from ctypes import *
 
+import columns
+import compact
+from columns import BinaryArray, _to_str
 from ttypes import Type
 
 logger = logging.getLogger("parquet")
 
-
-def read_plain_boolean(fo):
-    """Reads a boolean using the plain encoding"""
-    raise NotImplemented
+try:
+    import numpy
+except ImportError:
+    numpy = None
 
 
 def read_plain_int32(fo):
@@ -56,8 +60,9 @@ def read_plain_byte_array_fixed(fo, fixed_length):
     """Reads a byte array of the given fixed_length"""
     return fo.read(fixed_length)
 
+# PLAIN booleans are bit-packed, eight to a byte, so they can only be
+# decoded a page at a time, with read_plain_boolean_batch.
 DECODE_PLAIN = {
-    Type.BOOLEAN: read_plain_boolean,
     Type.INT32: read_plain_int32,
     Type.INT64: read_plain_int64,
     Type.INT96: read_plain_int96,
@@ -68,6 +73,160 @@ DECODE_PLAIN = {
 }
 
 
+# Physical types of fixed width that read_plain_batch decodes, with their
+# numpy dtype and the array typecode used when numpy isn't available (None
+# for INT64 if there is no 64-bit one, see columns.int64_typecode).
+FIXED_WIDTH_TYPES = {
+    Type.INT32: ('<i4', columns.INT32_TYPECODE),
+    Type.INT64: ('<i8', columns.INT64_TYPECODE),
+    Type.FLOAT: ('<f4', 'f'),
+    Type.DOUBLE: ('<f8', 'd'),
+}
+
+
+def read_plain_batch(data, type_, count, offset=0):
+    """Reads count PLAIN encoded values of the fixed width type_ (see
+    FIXED_WIDTH_TYPES) starting at offset of data, a str, buffer or
+    memoryview.
+
+    Returns a numpy array, which is a zero-copy view of data, or an
+    array.array when numpy isn't available."""
+    dtype, typecode = FIXED_WIDTH_TYPES[type_]
+    if numpy is not None:
+        if not isinstance(data, memoryview):
+            return numpy.frombuffer(data, dtype, count, offset)
+        # numpy on python 2 only takes memoryviews through asarray.
+        end = offset + count * numpy.dtype(dtype).itemsize
+        if end > len(data):
+            raise ValueError("buffer is smaller than requested size")
+        return numpy.asarray(data)[offset:end].view(dtype)
+    if typecode is None:
+        typecode = columns.int64_typecode()
+    values = array.array(typecode)
+    end = offset + count * values.itemsize
+    if end > len(data):
+        raise ValueError("buffer is smaller than requested size")
+    if isinstance(data, memoryview):
+        values.fromstring(data[offset:end].tobytes())
+    else:
+        values.fromstring(buffer(data, offset, end - offset))
+    if sys.byteorder == 'big':
+        values.byteswap()
+    return values
+
+
+def read_plain_fixed_batch(data, count, length, pos=0):
+    """Reads count PLAIN encoded FIXED_LEN_BYTE_ARRAY values of the given
+    length starting at pos of data (a str, buffer or memoryview).
+
+    Returns a (count, length) uint8 numpy array, which is a zero-copy view
+    of data; .view('S{length}') turns it into an array of strs (mind that
+    numpy drops trailing NUL bytes of those). Without numpy, a list of strs
+    is returned, see read_plain_fixed_strs."""
+    if numpy is None:
+        return read_plain_fixed_strs(data, count, length, pos)
+    end = pos + count * length
+    if end > len(data):
+        raise ValueError("buffer is smaller than requested size")
+    return columns._as_uint8(data)[pos:end].reshape(count, length)
+
+
+def read_plain_fixed_strs(data, count, length, pos=0):
+    """Like read_plain_fixed_batch, but returns the values as a list of strs,
+    sliced from a single copy of their bytes."""
+    end = pos + count * length
+    if end > len(data):
+        raise ValueError("buffer is smaller than requested size")
+    chunk = _to_str(data, pos, end)
+    if length == 0:
+        return [""] * count
+    return [chunk[i:i + length] for i in xrange(0, len(chunk), length)]
+
+
+def _boolean_table():
+    """Returns the bits of every byte value, least significant bit first:
+    a (256, 8) bool numpy array, or a list of tuples without numpy."""
+    if numpy is not None:
+        bits = numpy.unpackbits(numpy.arange(256, dtype=numpy.uint8)[:, None],
+                                axis=1)
+        return bits[:, ::-1].astype(numpy.bool_)
+    return [tuple(bool(b >> i & 1) for i in range(8)) for b in range(256)]
+
+
+_BOOLEAN_TABLES = {}
+
+
+def read_plain_boolean_batch(data, count, pos=0):
+    """Reads count PLAIN encoded booleans starting at pos of data (a str,
+    buffer or memoryview), returning them along with the position just past
+    them. The values are a numpy bool array, or a list without numpy.
+
+    The values are bit-packed starting with the least significant bit of
+    each byte, so every byte is expanded at once by looking its 8 values up
+    in a table."""
+    end = pos + (count + 7) // 8
+    if end > len(data):
+        raise ValueError("buffer is smaller than requested size")
+    key = numpy is not None
+    table = _BOOLEAN_TABLES.get(key)
+    if table is None:
+        table = _BOOLEAN_TABLES[key] = _boolean_table()
+    if numpy is not None:
+        values = table[columns._as_uint8(data)[pos:end]].reshape(-1)
+        return values[:count], end
+    values = []
+    for byte in bytearray(_to_str(data, pos, end)):
+        values.extend(table[byte])
+    del values[count:]
+    return values, end
+
+
+# Julian day number of the unix epoch, 1970-01-01.
+JULIAN_DAY_OF_EPOCH = 2440588
+
+NANOS_PER_DAY = 24 * 60 * 60 * 10 ** 9
+
+# An INT96 timestamp as written by Impala and Hive: the nanoseconds within
+# the day followed by the julian day number.
+_INT96 = struct.Struct("<qi")
+if numpy is not None:
+    _INT96_DTYPE = numpy.dtype([('nanos', '<i8'), ('julian_day', '<i4')])
+
+
+def read_int96_timestamp_batch(data, count, pos=0):
+    """Reads count PLAIN encoded INT96 timestamps starting at pos of data (a
+    str, buffer or memoryview).
+
+    The page is viewed as an array of (nanos, julian day) records and the
+    timestamps are computed for all of them at once, returning a numpy
+    datetime64[ns] array. Without numpy, a list of nanoseconds since the
+    epoch is returned."""
+    end = pos + 12 * count
+    if end > len(data):
+        raise ValueError("buffer is smaller than requested size")
+    if numpy is not None:
+        records = columns._as_uint8(data)[pos:end].view(_INT96_DTYPE)
+        nanos = records['julian_day'].astype(numpy.int64)
+        nanos -= JULIAN_DAY_OF_EPOCH
+        nanos *= NANOS_PER_DAY
+        nanos += records['nanos']
+        return nanos.view('datetime64[ns]')
+    unpack = _INT96.unpack_from
+    return [(day - JULIAN_DAY_OF_EPOCH) * NANOS_PER_DAY + nanos
+            for nanos, day in (unpack(data, p) for p in xrange(pos, end, 12))]
+
+
+def int96_values_to_timestamps(values):
+    """Converts INT96 values as returned by read_plain_int96 (e.g. the
+    entries of a dictionary page) to timestamps, like
+    read_int96_timestamp_batch."""
+    nanos = [((v & 0xFFFFFFFF) - JULIAN_DAY_OF_EPOCH) * NANOS_PER_DAY +
+             (v >> 32) for v in values]
+    if numpy is not None:
+        return numpy.array(nanos, numpy.int64).view('datetime64[ns]')
+    return nanos
+
+
 def read_plain(fo, type_, type_length):
     conv = DECODE_PLAIN[type_]
     if type_ == Type.FIXED_LEN_BYTE_ARRAY:
@@ -228,59 +387,265 @@ def read_rle_bit_packed_hybrid(fo, width, length=None):
             res += read_bitpacked(io_obj, header, width)
     return res
 
-def unpackminiblock(values, bytes, width):
-    idx = 0
-    t = 0
-    tmp_bits = 0
-    m = _mask_for_bits(width)
-    done = False
-    logger.debug("miniblock: %s", bytes)
-    while not done:
-        if tmp_bits >= width:
-            values.append( t & m)
-            t = t >> width
-            tmp_bits -= width
-        else:
-            if idx < len(bytes):
-                t = t | (bytes[idx] << tmp_bits)
-                idx += 1
-                tmp_bits += 8
+def _little_endian_int(chunk):
+    """Returns the unsigned little endian integer stored in the str chunk."""
+    return int(binascii.hexlify(chunk[::-1]), 16) if chunk else 0
+
+
+def _new_int64_array(count):
+    """Returns a zeroed array of count 64-bit ints, see _new_int_array."""
+    if numpy is not None:
+        return numpy.zeros(count, numpy.int64)
+    return array.array(columns.int64_typecode(), [0]) * count
+
+
+def _new_int_array(count, value=0):
+    """Returns an array of count 32-bit ints that are all value: a numpy
+    array, or an array.array when numpy isn't available."""
+    if numpy is not None:
+        if value == 0:
+            return numpy.zeros(count, numpy.int32)
+        return numpy.full(count, value, numpy.int32)
+    return array.array('i', [value]) * count
+
+
+_INT32 = struct.Struct("<i")
+
+# Bit-packed runs of at least this many values are unpacked with numpy.
+NUMPY_MIN_BIT_PACKED = 64
+
+
+def _unpack_bits_numpy(data, pos, width, count):
+    """Unpacks count width-bit values packed LSB first starting at pos of
+    data, returning a numpy array of uint64."""
+    nbytes = (count * width + 7) / 8
+    # pad, so that the up to 5 bytes spanned by a value can always be read.
+    padded = numpy.zeros(nbytes + 8, numpy.uint8)
+    raw = numpy.frombuffer(_to_str(data, pos, pos + nbytes), numpy.uint8)
+    padded[:len(raw)] = raw
+    bits = numpy.arange(count, dtype=numpy.uint64) * numpy.uint64(width)
+    first = (bits >> numpy.uint64(3)).astype(numpy.intp)
+    words = numpy.zeros(count, numpy.uint64)
+    for i in xrange((width + 14) / 8):
+        words |= padded[first + i].astype(numpy.uint64) << numpy.uint64(8 * i)
+    words >>= bits & numpy.uint64(7)
+    return words & numpy.uint64(_mask_for_bits(width))
+
+
+def _unpack_bits_list(data, pos, width, count):
+    """Unpacks count width-bit values packed LSB first starting at pos of
+    data into a list, a whole group of 8 values at a time."""
+    if width == 0:
+        return [0] * count
+    mask = _mask_for_bits(width)
+    shifts = range(0, 8 * width, width)
+    groups = _to_str(data, pos, pos + width * ((count + 7) / 8))
+    values = []
+    for g in xrange(0, len(groups), width):
+        word = _little_endian_int(groups[g:g + width])
+        values.extend([(word >> shift) & mask for shift in shifts])
+    del values[count:]
+    return values
+
+
+def _unpack_bits(data, pos, width, out, start, count):
+    """Unpacks count width-bit values packed LSB first starting at pos of
+    data into out[start:start + count]."""
+    if numpy is not None and count >= NUMPY_MIN_BIT_PACKED:
+        out[start:start + count] = _unpack_bits_numpy(data, pos, width,
+                                                      count)
+        return
+    values = _unpack_bits_list(data, pos, width, count)
+    if isinstance(out, array.array):
+        values = array.array('i', values)
+    out[start:start + len(values)] = values
+
+
+def read_rle_bit_packed_hybrid_batch(data, width, count, pos=0, end=None):
+    """Decodes up to count values of the rle/bit-packed hybrid encoding from
+    data (a str, buffer or memoryview) between pos and end (the end of data
+    by default).
+
+    Returns the values as an array of 32-bit ints (see _new_int_array),
+    which is shorter than count if the data runs out first. Rle runs are
+    written with a single fill and bit-packed runs are unpacked in bulk."""
+    if end is None:
+        end = len(data)
+    out = _new_int_array(count)
+    filled = 0
+    value_width = byte_width(width)
+    while filled < count and pos < end:
+        header, pos = compact.read_varint(data, pos)
+        if header & 1 == 0:
+            n = min(header >> 1, count - filled)
+            value = _little_endian_int(_to_str(data, pos, pos + value_width))
+            pos += value_width
+            if numpy is not None:
+                out[filled:filled + n] = value
             else:
-                done = True
+                out[filled:filled + n] = array.array('i', [value]) * n
+        else:
+            groups = header >> 1
+            n = min(groups * 8, count - filled)
+            _unpack_bits(data, pos, width, out, filled, n)
+            pos += groups * width
+        filled += n
+    if filled < count:
+        return out[:filled]
+    return out
+
+
+def rle_run_value(data, width, count, pos=0):
+    """Returns the value of the rle/bit-packed hybrid data at pos if its
+    first run is an rle run of at least count values, so that all of the
+    first count values are the same. Returns None otherwise."""
+    if pos >= len(data):
+        return None
+    header, pos = compact.read_varint(data, pos)
+    if header & 1 or header >> 1 < count:
+        return None
+    return _little_endian_int(_to_str(data, pos, pos + byte_width(width)))
+
+
+def _wrap_int64(value):
+    """Wraps value around to a signed 64-bit int, as delta encoded values
+    are computed modulo 2**64."""
+    if -(1 << 63) <= value < (1 << 63):
+        return value
+    return (value + (1 << 63)) % (1 << 64) - (1 << 63)
+
+
+def _miniblock_deltas(data, pos, width, count, min_delta):
+    """Returns the count deltas of the miniblock at pos of data, with min_delta
+    added: an int64 numpy array, or a list without numpy."""
+    if numpy is None:
+        return [d + min_delta for d in _unpack_bits_list(data, pos, width,
+                                                         count)]
+    if width <= 56:
+        deltas = _unpack_bits_numpy(data, pos, width, count)
+    else:
+        # values this wide can span more bytes than fit in a uint64.
+        deltas = numpy.array(_unpack_bits_list(data, pos, width, count),
+                             numpy.uint64)
+    return deltas.astype(numpy.int64) + numpy.int64(min_delta)
+
+
+def read_delta_binary_packed_batch(data, pos=0):
+    """Decodes the DELTA_BINARY_PACKED values starting at pos of data (a
+    str, buffer or memoryview), returning them as an array of 64-bit ints
+    along with the position just past them. The array is a numpy array, or
+    an array.array when numpy isn't available.
+
+    The bit-packed deltas of each miniblock are unpacked in bulk and the
+    values are computed as the prefix sums of all of the deltas at once."""
+    values_per_block, pos = compact.read_varint(data, pos)
+    miniblocks_per_block, pos = compact.read_varint(data, pos)
+    total_values, pos = compact.read_varint(data, pos)
+    first_value, pos = compact.read_zigzag(data, pos)
+    values_per_miniblock = values_per_block / miniblocks_per_block
+    logger.debug("values_per_block:%s, miniblocks_per_block:%s, "
+                 "total_values:%s, first value:%s", values_per_block,
+                 miniblocks_per_block, total_values, first_value)
+    deltas = []
+    remaining = total_values - 1
+    while remaining > 0:
+        min_delta, pos = compact.read_zigzag(data, pos)
+        bit_widths = bytearray(_to_str(data, pos, pos + miniblocks_per_block))
+        pos += miniblocks_per_block
+        # the last block has no bodies for the miniblocks it doesn't need.
+        for bit_width in bit_widths:
+            if remaining <= 0:
+                break
+            count = min(values_per_miniblock, remaining)
+            deltas.append(_miniblock_deltas(data, pos, bit_width, count,
+                                            min_delta))
+            pos += values_per_miniblock * bit_width / 8
+            remaining -= count
+    if total_values == 0:
+        return _new_int64_array(0), pos
+    if numpy is not None:
+        values = numpy.empty(total_values, numpy.int64)
+        values[0] = 0
+        if deltas:
+            numpy.cumsum(numpy.concatenate(deltas), out=values[1:])
+        values += numpy.int64(first_value)
+        return values, pos
+    values = _new_int64_array(0)
+    value = first_value
+    values.append(value)
+    for miniblock in deltas:
+        for delta in miniblock:
+            value = _wrap_int64(value + delta)
+            values.append(value)
+    return values, pos
+
 
 def read_delta_binary_packed(fo):
-    values_per_block     = read_unsigned_var_int(fo)
-    miniblocks_per_block = read_unsigned_var_int(fo)
-    values_per_minblock  = values_per_block / miniblocks_per_block
-    total_values = read_unsigned_var_int(fo)
-    first_value = read_zigzag_var_int(fo)
-    logger.debug("values_per_block:%s, miniblocks_per_block:%s, total_values:%s, first value:%s",
-        values_per_block, miniblocks_per_block, total_values, first_value)
-    values = [first_value]
-    while len(values) < total_values:
-        #read miniblock
-        mindelta = read_zigzag_var_int(fo)
-        bitwidths = array.array('B', fo.read(miniblocks_per_block)).tolist()
-        logger.debug("min delta:%s, bitwidths:%s",
-             mindelta, bitwidths)
-        num_mini_blocks = 1 + (total_values - len(values)) / values_per_minblock
-        num_mini_blocks = min(num_mini_blocks, miniblocks_per_block)
-        for i in range(num_mini_blocks):
-            bitwidth = bitwidths[i]
-            miniblock_size = (values_per_minblock * bitwidth / 8)
-            #logger.debug(" mini block:%s/%s bytes:%s", i, num_mini_blocks, miniblock_size)
-            start = len(values)
-            if miniblock_size > 0:
-                bytes = array.array('B', fo.read(miniblock_size)).tolist()
-                unpackminiblock(values, bytes, bitwidth)
-                #logger.debug("add values: %s", values[start:])
-                for i in range(start, len(values)):
-                    values[i] += mindelta + values[i-1]
-                #logger.debug("adjusted values: %s", values[start:])
-            else:
-                for i in range(values_per_minblock):
-                    values.append(mindelta + values[start+i-1])
-    return values[0:total_values]
+    """Reads DELTA_BINARY_PACKED values from fo into a list, see
+    read_delta_binary_packed_batch."""
+    start = fo.tell()
+    data = fo.read()
+    values, end = read_delta_binary_packed_batch(data)
+    fo.seek(start + end)
+    return values.tolist()
+
+def read_plain_byte_array_batch(data, count, pos=0):
+    """Reads count PLAIN encoded BYTE_ARRAY values starting at pos of data (a
+    str, buffer or memoryview), returning them as a columns.BinaryArray along
+    with the position just past them.
+
+    The values are copied into one contiguous buffer without their length
+    prefixes, so no str is created per value."""
+    begin = pos
+    unpack_length = _INT32.unpack_from
+    starts = []
+    lengths = []
+    for _ in xrange(count):
+        length = unpack_length(data, pos)[0]
+        starts.append(pos + 4)
+        lengths.append(length)
+        pos += 4 + length
+    if pos > len(data):
+        raise ValueError("byte array extends past the end of the buffer")
+    offsets = _new_int64_array(count + 1)
+    if numpy is not None:
+        lengths = numpy.array(lengths, numpy.int64)
+        numpy.cumsum(lengths, out=offsets[1:])
+        # drop the length prefixes with a mask of the page bytes, which
+        # takes a byte per byte of data rather than a gather index.
+        raw = columns._as_uint8(data)[begin:pos]
+        keep = numpy.ones(len(raw), numpy.bool_)
+        prefixes = numpy.array(starts, numpy.int64) - (begin + 4)
+        keep[prefixes[:, numpy.newaxis] + numpy.arange(4)] = False
+        return BinaryArray(raw[keep].tostring(), offsets), pos
+    total = 0
+    for i, length in enumerate(lengths):
+        total += length
+        offsets[i + 1] = total
+    values = "".join([_to_str(data, start, start + length)
+                      for start, length in zip(starts, lengths)])
+    return BinaryArray(values, offsets), pos
+
+
+def read_delta_length_byte_array_batch(data, pos=0):
+    """Reads DELTA_LENGTH_BYTE_ARRAY encoded values starting at pos of data,
+    returning them as a columns.BinaryArray along with the position just
+    past them. The values are stored back to back after their lengths, so
+    they are copied out with a single slice."""
+    lengths, pos = read_delta_binary_packed_batch(data, pos)
+    offsets = _new_int64_array(len(lengths) + 1)
+    if numpy is not None:
+        numpy.cumsum(lengths, out=offsets[1:])
+    else:
+        total = 0
+        for i, length in enumerate(lengths):
+            total += length
+            offsets[i + 1] = total
+    end = pos + int(offsets[-1])
+    if end > len(data):
+        raise ValueError("byte array extends past the end of the buffer")
+    return BinaryArray(_to_str(data, pos, end), offsets), end
+
 
 def read_delta_length_byte_array(fo):
     lengths = read_delta_binary_packed(fo)
@@ -308,19 +673,3 @@ def read_delta_byte_array(fo):
         previous = v
         retval.append(v)
     return retval
-
-class delta_binary_packed_reader:
-    def __init__(self, fo):
-        self._block_size_in_values = read_unsigend_var_int(fo)
-        self._num_min_blocks = read_unsigned_var_int(fo)
-        self._total_values = read_unsigned_var_int(fo)
-        self._bit_widths = range(self._num_min_blocks)
-        first_value = read_zigzag_var_int(fo)
-        _values = [first_value]
-        while len(_values) < self._total_values:
-            min_delta = read_zigzag_var_int(fo)
-            bit_widths = array.array('B', fo.read(self._num_min_blocks)).tolist()
-
-
-    def read_i32(self):
-        pass
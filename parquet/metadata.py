@@ -0,0 +1,287 @@
+"""Footer metadata helpers for wide files.
+
+LazyFileMetaData is a stand-in for the thrift generated FileMetaData. The
+schema and the row group level fields are decoded up front, but the
+ColumnChunk structs of every row group are only located (their bytes are
+skipped over) and each one is decoded the first time it's accessed.
+
+ColumnChunkIndex is a compact, array backed index of the column chunks in a
+file used to look up columns and plan I/O without walking the footer.
+FooterEntry keeps it with the footer in cache.footer_cache, so that it's
+only built once per file, and tells the cache how much memory they take."""
+
+import array
+
+from thrift.protocol import TCompactProtocol
+from thrift.transport import TTransport
+
+import cache
+import columns
+import compact
+from schema import SchemaHelper
+from ttypes import ColumnChunk, KeyValue, SchemaElement, SortingColumn
+
+# array typecode for the file offsets and sizes; a C long where there is
+# no 64-bit one, which limits the index to files of up to 2GB.
+INT64 = columns.INT64_TYPECODE or 'l'
+
+
+def _decode_struct(cls, data):
+    """Decodes an instance of the thrift struct cls from data."""
+    obj = cls()
+    obj.read(TCompactProtocol.TCompactProtocol(TTransport.TMemoryBuffer(data)))
+    return obj
+
+
+def _read_struct_list(buf, pos, cls, fast):
+    """Reads a list of thrift structs of type cls starting at pos, using the
+    parquet.compact decoder if fast is True."""
+    size, _, pos = compact.read_collection_header(buf, pos)
+    items = []
+    for _ in xrange(size):
+        if fast:
+            item, pos = compact.read_struct(buf, pos, cls)
+        else:
+            end = compact.skip(buf, pos, compact.CT_STRUCT)
+            item = _decode_struct(cls, buf[pos:end])
+            pos = end
+        items.append(item)
+    return items, pos
+
+
+class LazyColumnChunks(object):
+    """Sequence of the ColumnChunks of a row group. Only the offsets of the
+    serialized structs are kept; each ColumnChunk is decoded (and then kept)
+    on first access."""
+
+    def __init__(self, buf, offsets, fast=False):
+        self._buf = buf
+        self._offsets = offsets
+        self._fast = fast
+        self._decoded = [None] * (len(offsets) - 1)
+
+    def __len__(self):
+        return len(self._decoded)
+
+    def __getitem__(self, idx):
+        if isinstance(idx, slice):
+            return [self[i] for i in xrange(*idx.indices(len(self)))]
+        cc = self._decoded[idx]
+        if cc is None:
+            if idx < 0:
+                idx += len(self)
+            cc = self._decode(idx)
+            self._decoded[idx] = cc
+        return cc
+
+    def _decode(self, idx):
+        """Decodes the ColumnChunk at idx, without keeping it."""
+        start = self._offsets[idx]
+        if self._fast:
+            return compact.read_struct(self._buf, start, ColumnChunk)[0]
+        return _decode_struct(ColumnChunk,
+                              self._buf[start:self._offsets[idx + 1]])
+
+    def __iter__(self):
+        for idx in xrange(len(self)):
+            yield self[idx]
+
+    def num_decoded(self):
+        """Returns the number of ColumnChunks decoded so far."""
+        return len(self._decoded) - self._decoded.count(None)
+
+
+class LazyRowGroup(object):
+    """Stand-in for RowGroup whose columns are a LazyColumnChunks."""
+
+    def __init__(self, buf, pos, fast=False):
+        self.columns = None
+        self.total_byte_size = None
+        self.num_rows = None
+        self.sorting_columns = None
+        fid = 0
+        while True:
+            fid, ctype, pos = compact.read_field_header(buf, pos, fid)
+            if ctype == compact.CT_STOP:
+                break
+            if fid == 1 and ctype == compact.CT_LIST:
+                size, _, pos = compact.read_collection_header(buf, pos)
+                offsets = array.array('l', [pos])
+                for _ in xrange(size):
+                    pos = compact.skip(buf, pos, compact.CT_STRUCT)
+                    offsets.append(pos)
+                self.columns = LazyColumnChunks(buf, offsets, fast)
+            elif fid == 2 and ctype == compact.CT_I64:
+                self.total_byte_size, pos = compact.read_zigzag(buf, pos)
+            elif fid == 3 and ctype == compact.CT_I64:
+                self.num_rows, pos = compact.read_zigzag(buf, pos)
+            elif fid == 4 and ctype == compact.CT_LIST:
+                self.sorting_columns, pos = _read_struct_list(
+                    buf, pos, SortingColumn, fast)
+            else:
+                pos = compact.skip(buf, pos, ctype)
+        self._end = pos
+
+
+class LazyFileMetaData(object):
+    """Stand-in for FileMetaData decoded from the serialized footer bytes, see
+    the module documentation. If fast is True, structs are decoded with
+    compact.read_struct rather than the generated thrift code."""
+
+    def __init__(self, buf, fast=False):
+        self.version = None
+        self.schema = None
+        self.num_rows = None
+        self.row_groups = None
+        self.key_value_metadata = None
+        self.created_by = None
+        pos = 0
+        fid = 0
+        while True:
+            fid, ctype, pos = compact.read_field_header(buf, pos, fid)
+            if ctype == compact.CT_STOP:
+                break
+            if fid == 1 and ctype == compact.CT_I32:
+                self.version, pos = compact.read_zigzag(buf, pos)
+            elif fid == 2 and ctype == compact.CT_LIST:
+                self.schema, pos = _read_struct_list(
+                    buf, pos, SchemaElement, fast)
+            elif fid == 3 and ctype == compact.CT_I64:
+                self.num_rows, pos = compact.read_zigzag(buf, pos)
+            elif fid == 4 and ctype == compact.CT_LIST:
+                size, _, pos = compact.read_collection_header(buf, pos)
+                self.row_groups = []
+                for _ in xrange(size):
+                    rg = LazyRowGroup(buf, pos, fast)
+                    self.row_groups.append(rg)
+                    pos = rg._end
+            elif fid == 5 and ctype == compact.CT_LIST:
+                self.key_value_metadata, pos = _read_struct_list(
+                    buf, pos, KeyValue, fast)
+            elif fid == 6 and ctype == compact.CT_BINARY:
+                self.created_by, pos = compact.read_binary(buf, pos)
+            else:
+                pos = compact.skip(buf, pos, ctype)
+
+
+def chunk_offset(cmd):
+    """Returns the file offset of the first page of the column chunk
+    described by the ColumnMetaData cmd (the dictionary page, if any)."""
+    dict_offset = cmd.dictionary_page_offset
+    data_offset = cmd.data_page_offset
+    if dict_offset is None or data_offset < dict_offset:
+        return data_offset
+    return dict_offset
+
+
+class ColumnChunkIndex(object):
+    """Index of the column chunks of a file built once from its footer.
+
+    Maps each leaf column path to its ordinal within a row group (columns are
+    stored in schema order) and keeps the offset, compressed size, number of
+    values and codec of every chunk in flat int64 arrays laid out
+    [row_group][column]. For a LazyFileMetaData footer, the entries of a
+    column are only filled in (decoding its chunks) when the column is first
+    looked up."""
+
+    def __init__(self, footer, schema_helper):
+        self._row_groups = footer.row_groups
+        self._path_lists = schema_helper.leaf_paths()
+        self.paths = ['.'.join(path) for path in self._path_lists]
+        self._ordinals = dict((p, idx) for idx, p in enumerate(self.paths))
+        self.num_columns = len(self.paths)
+        self.num_row_groups = len(footer.row_groups)
+        self.num_rows = array.array(
+            INT64, [rg.num_rows for rg in footer.row_groups])
+        size = self.num_row_groups * self.num_columns
+        self.offsets = array.array(INT64, [0]) * size
+        self.compressed_sizes = array.array(INT64, [0]) * size
+        self.num_values = array.array(INT64, [0]) * size
+        self.codecs = array.array(INT64, [0]) * size
+        self._loaded = bytearray(self.num_columns)
+        if not isinstance(footer, LazyFileMetaData):
+            for column in xrange(self.num_columns):
+                self._load(column)
+
+    def _load(self, column):
+        """Fills in the array entries of the given column ordinal."""
+        expected = self._path_lists[column]
+        for rg_idx, rg in enumerate(self._row_groups):
+            cmd = rg.columns[column].meta_data
+            if cmd.path_in_schema != expected:
+                raise ValueError(
+                    "Column chunk {0} is {1}, expected {2}".format(
+                        column, '.'.join(cmd.path_in_schema),
+                        self.paths[column]))
+            i = rg_idx * self.num_columns + column
+            self.offsets[i] = chunk_offset(cmd)
+            self.compressed_sizes[i] = cmd.total_compressed_size
+            self.num_values[i] = cmd.num_values
+            self.codecs[i] = cmd.codec
+        self._loaded[column] = 1
+
+    def __contains__(self, path):
+        return path in self._ordinals
+
+    def column(self, path):
+        """Returns the ordinal of the column with the given (dotted) path."""
+        column = self._ordinals[path]
+        if not self._loaded[column]:
+            self._load(column)
+        return column
+
+    def chunk(self, row_group, column):
+        """Returns (offset, compressed size, num values, codec) of the chunk
+        of the given column ordinal in the given row group."""
+        if not self._loaded[column]:
+            self._load(column)
+        i = row_group * self.num_columns + column
+        return (self.offsets[i], self.compressed_sizes[i],
+                self.num_values[i], self.codecs[i])
+
+    def column_metadata(self, row_group, column):
+        """Returns the ColumnMetaData of the chunk of the given column
+        ordinal in the given row group."""
+        return self._row_groups[row_group].columns[column].meta_data
+
+
+class FooterEntry(object):
+    """A decoded footer along with the SchemaHelper and ColumnChunkIndex
+    built from it. Both are created the first time they're needed and are
+    then shared, like the footer, by every reader of the file."""
+
+    def __init__(self, footer):
+        self.footer = footer
+        self._schema_helper = None
+        self._index = None
+
+    @property
+    def schema_helper(self):
+        if self._schema_helper is None:
+            self._schema_helper = SchemaHelper(self.footer.schema)
+        return self._schema_helper
+
+    @property
+    def index(self):
+        if self._index is None:
+            self._index = ColumnChunkIndex(self.footer, self.schema_helper)
+        return self._index
+
+    def approximate_size(self):
+        """Returns an estimate of the memory the entry takes up once its
+        SchemaHelper and ColumnChunkIndex are built (they are, by this call)
+        and every ColumnChunk of a lazy footer is decoded. The ColumnChunks
+        that aren't decoded yet are assumed to be as large as the first
+        one (decoded just to be measured), so that the entry isn't charged
+        too little for a cache."""
+        self.index
+        size = cache.approximate_size(self)
+        chunk_size = None
+        for rg in self.footer.row_groups or []:
+            if not isinstance(rg.columns, LazyColumnChunks) or \
+                    not len(rg.columns):
+                continue
+            if chunk_size is None:
+                chunk_size = cache.approximate_size(rg.columns._decode(0))
+            size += (len(rg.columns) - rg.columns.num_decoded()) * chunk_size
+        return size
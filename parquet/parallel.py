@@ -0,0 +1,75 @@
+"""Ordered parallel map over a pool of workers, used to decompress the pages
+of a column on several cores.
+
+The pages of a column chunk are independent of each other once their
+headers have been read, and zlib and snappy release the GIL while they
+work, so decompressing on a pool of threads scales with the number of
+cores. A WorkerPool uses a concurrent.futures executor when one is given
+(or the module is available) and a multiprocessing.pool.ThreadPool
+otherwise."""
+
+import collections
+import multiprocessing
+import multiprocessing.pool
+
+try:
+    import concurrent.futures
+except ImportError:
+    concurrent = None
+
+
+def cpu_count():
+    try:
+        return multiprocessing.cpu_count()
+    except NotImplementedError:
+        return 1
+
+
+class WorkerPool(object):
+    """Runs calls on workers worker threads, or on the given
+    concurrent.futures executor. At most window calls (twice the number of
+    workers by default) are in flight in any one imap()."""
+
+    def __init__(self, workers=None, executor=None, window=None):
+        self.workers = workers or cpu_count()
+        self.window = window or 2 * self.workers
+        self._executor = executor
+        self._own_pool = None
+        # arguments have to be pickled to get to the workers.
+        self.processes = concurrent is not None and isinstance(
+            executor, concurrent.futures.ProcessPoolExecutor)
+
+    def _submit(self, fn, arg):
+        """Starts fn(arg) and returns a function waiting for its result."""
+        if self._executor is not None:
+            return self._executor.submit(fn, arg).result
+        if self._own_pool is None:
+            if concurrent is not None:
+                self._own_pool = concurrent.futures.ThreadPoolExecutor(
+                    self.workers)
+            else:
+                self._own_pool = multiprocessing.pool.ThreadPool(self.workers)
+        if concurrent is not None:
+            return self._own_pool.submit(fn, arg).result
+        return self._own_pool.apply_async(fn, (arg,)).get
+
+    def imap(self, fn, items):
+        """Yields fn(item) for each of the items, in order."""
+        pending = collections.deque()
+        for item in items:
+            pending.append(self._submit(fn, item))
+            if len(pending) >= self.window:
+                yield pending.popleft()()
+        while pending:
+            yield pending.popleft()()
+
+    def close(self):
+        """Shuts down the worker threads started by the pool (an executor
+        passed in is left to its owner)."""
+        if self._own_pool is not None:
+            if concurrent is not None:
+                self._own_pool.shutdown()
+            else:
+                self._own_pool.close()
+                self._own_pool.join()
+            self._own_pool = None
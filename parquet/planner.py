@@ -0,0 +1,89 @@
+"""I/O planning for reading many column chunks at once.
+
+IOPlanner takes the byte ranges of the column chunks a reader needs, merges
+ranges that are close together on disk into larger requests and hands back
+a memoryview per chunk. The counters it keeps (requests issued, bytes read
+and bytes read only to fill gaps) are meant for tuning max_gap and
+max_request to the storage: small gaps on local SSDs, large ones on remote
+storage where every request is expensive."""
+
+# Ranges separated by at most this many bytes are merged into one request.
+DEFAULT_MAX_GAP = 64 * 1024
+
+# Ranges are not merged into requests larger than this. A single range that
+# is larger is still read with one request.
+DEFAULT_MAX_REQUEST = 32 * 1024 * 1024
+
+
+class IORequest(object):
+    """A single read covering one or more (key, offset, size) ranges."""
+
+    def __init__(self, offset, end, ranges):
+        self.offset = offset
+        self.end = end
+        self.ranges = ranges
+
+    @property
+    def size(self):
+        return self.end - self.offset
+
+    def __repr__(self):
+        return "IORequest(offset={0}, size={1}, ranges={2})".format(
+            self.offset, self.size, len(self.ranges))
+
+
+class IOPlanner(object):
+
+    def __init__(self, max_gap=DEFAULT_MAX_GAP,
+                 max_request=DEFAULT_MAX_REQUEST):
+        self.max_gap = max_gap
+        self.max_request = max_request
+        self.requests = 0
+        self.bytes_read = 0
+        self.bytes_overread = 0
+
+    def plan(self, ranges):
+        """Returns the list of IORequests covering the given (key, offset,
+        size) ranges, in file order."""
+        requests = []
+        current = None
+        for key, offset, size in sorted(ranges, key=lambda r: r[1]):
+            end = offset + size
+            if current is not None and \
+                    offset - current.end <= self.max_gap and \
+                    max(end, current.end) - current.offset <= self.max_request:
+                current.end = max(end, current.end)
+                current.ranges.append((key, offset, size))
+            else:
+                current = IORequest(offset, end, [(key, offset, size)])
+                requests.append(current)
+        return requests
+
+    def fetch(self, fo, ranges):
+        """Reads the given (key, offset, size) ranges from fo, returning a
+        dict of key to a memoryview over the bytes of that range."""
+        result = {}
+        for request in self.plan(ranges):
+            fo.seek(request.offset, 0)
+            view = memoryview(fo.read(request.size))
+            self.requests += 1
+            self.bytes_read += len(view)
+            covered = 0
+            covered_end = request.offset
+            for key, offset, size in request.ranges:
+                start = offset - request.offset
+                result[key] = view[start:start + size]
+                end = offset + size
+                covered += max(0, end - max(offset, covered_end))
+                covered_end = max(covered_end, end)
+            self.bytes_overread += request.size - covered
+        return result
+
+    def stats(self):
+        """Returns a dict with the number of requests issued, the bytes read
+        and the bytes read that weren't part of any requested range."""
+        return {
+            'requests': self.requests,
+            'bytes_read': self.bytes_read,
+            'bytes_overread': self.bytes_overread,
+        }
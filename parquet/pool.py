@@ -0,0 +1,77 @@
+"""A pool of reusable bytearrays for page I/O.
+
+Reading a column page by page allocates a new string for every page. A
+BufferPool keeps the bytearrays that pages were read into once they are no
+longer needed, grouped by size bucket (powers of two), and hands them out
+again for later pages of a similar size. This keeps allocation (and heap
+fragmentation) down for long running readers."""
+
+import threading
+
+# Smallest bucket handed out, smaller requests are rounded up to it.
+MIN_BUCKET_SIZE = 4 * 1024
+
+# Default bound on the bytes kept in idle buffers.
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+
+def bucket_size(size):
+    """Returns the size of the buffers used for requests of size bytes."""
+    bucket = MIN_BUCKET_SIZE
+    while bucket < size:
+        bucket <<= 1
+    return bucket
+
+
+class BufferPool(object):
+    """Free lists of bytearrays by bucket size, holding at most max_bytes of
+    idle buffers. Buffers released while the pool is full are dropped."""
+
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._free = {}
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.allocations = 0
+        self.reuses = 0
+
+    def acquire(self, size):
+        """Returns a bytearray of at least size bytes. Its contents are
+        undefined."""
+        bucket = bucket_size(size)
+        with self._lock:
+            free = self._free.get(bucket)
+            if free:
+                self._bytes -= bucket
+                self.reuses += 1
+                return free.pop()
+            self.allocations += 1
+        return bytearray(bucket)
+
+    def release(self, buf):
+        """Returns a buffer from acquire() to the pool. It must not be used by
+        the caller afterwards."""
+        bucket = len(buf)
+        with self._lock:
+            if self._bytes + bucket <= self.max_bytes:
+                self._free.setdefault(bucket, []).append(buf)
+                self._bytes += bucket
+
+    def clear(self):
+        with self._lock:
+            self._free.clear()
+            self._bytes = 0
+
+    def stats(self):
+        """Returns a dict with the number of buffers allocated, the number of
+        times a buffer was reused and the bytes held in idle buffers."""
+        with self._lock:
+            return {
+                'allocations': self.allocations,
+                'reuses': self.reuses,
+                'bytes': self._bytes,
+            }
+
+
+# Pool shared by the page readers.
+page_buffers = BufferPool()
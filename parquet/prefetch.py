@@ -0,0 +1,96 @@
+"""Background read-ahead for page and column chunk I/O.
+
+Page decoding is CPU bound and reading is blocking, so on cold caches the
+two are best overlapped: a Prefetcher runs the iterator producing pages in
+a background thread, which keeps a bounded number of items (and bytes)
+queued up ahead of the consumer."""
+
+import collections
+import sys
+import threading
+
+# Default bound on the bytes held in the read-ahead queue.
+DEFAULT_MAX_BYTES = 16 * 1024 * 1024
+
+
+class Prefetcher(object):
+    """Read-ahead settings: up to depth items, holding at most max_bytes,
+    are fetched ahead of the consumer. An item larger than max_bytes is
+    still fetched once the queue is empty. If decompress is True, pages are
+    decompressed in the background thread as well."""
+
+    def __init__(self, depth=4, max_bytes=DEFAULT_MAX_BYTES, decompress=True):
+        if depth < 1:
+            raise ValueError("depth must be at least 1")
+        self.depth = depth
+        self.max_bytes = max_bytes
+        self.decompress = decompress
+
+    def prefetch(self, items, size=len):
+        """Returns a generator over items, which are produced by a background
+        thread. size(item) gives the number of bytes an item holds."""
+        return _Pipeline(iter(items), self.depth, self.max_bytes,
+                         size).results()
+
+
+class _Pipeline(object):
+
+    def __init__(self, items, depth, max_bytes, size):
+        self._items = items
+        self._depth = depth
+        self._max_bytes = max_bytes
+        self._size = size
+        self._cond = threading.Condition()
+        self._queue = collections.deque()
+        self._bytes = 0
+        self._done = False
+        self._stopped = False
+        self._error = None
+
+    def _has_room(self, size):
+        return not self._queue or (len(self._queue) < self._depth and
+                                   self._bytes + size <= self._max_bytes)
+
+    def _produce(self):
+        try:
+            for item in self._items:
+                size = self._size(item)
+                with self._cond:
+                    while not self._stopped and not self._has_room(size):
+                        self._cond.wait()
+                    if self._stopped:
+                        return
+                    self._queue.append((item, size))
+                    self._bytes += size
+                    self._cond.notify_all()
+        except Exception:
+            self._error = sys.exc_info()
+        finally:
+            with self._cond:
+                self._done = True
+                self._cond.notify_all()
+
+    def results(self):
+        thread = threading.Thread(target=self._produce,
+                                  name="parquet-prefetch")
+        thread.daemon = True
+        thread.start()
+        try:
+            while True:
+                with self._cond:
+                    while not self._queue and not self._done:
+                        self._cond.wait()
+                    if not self._queue:
+                        break
+                    item, size = self._queue.popleft()
+                    self._bytes -= size
+                    self._cond.notify_all()
+                yield item
+            if self._error is not None:
+                raise self._error[0], self._error[1], self._error[2]
+        finally:
+            # stop the producer if the consumer gave up early.
+            with self._cond:
+                self._stopped = True
+                self._queue.clear()
+                self._cond.notify_all()
@@ -163,6 +163,8 @@ class SchemaHelper(object):
         self._rebuild_tree(SchemaHelper.ROOT_NODE, 0, 0, [])
         self._path_to_id = dict([('.'.join(self._element_path[id]), id)
             for id in range(0, len(self._schema_elements))])
+        self._leaf_ids = [id for id, e in enumerate(self._schema_elements)
+            if id != SchemaHelper.ROOT_NODE and e.num_children == None]
 
     def dump(self):
         for id,e in enumerate(self._schema_elements):
@@ -176,6 +178,11 @@ class SchemaHelper(object):
         for c,p in self._parent_to_child.items():
             print c,p
 
+    def leaf_paths(self):
+        """Returns the path (a list of names) of every leaf column, in
+        schema order."""
+        return [self._element_path[id] for id in self._leaf_ids]
+
     def schema_element(self, name):
         """Get the schema element with the given name."""
         id = self._path_to_id[name]
@@ -196,6 +203,19 @@ class SchemaHelper(object):
         id = self._path_to_id[path]
         return self._def_level[id]
 
+    def repeated_definition_levels(self, path):
+        """get the definition levels of the repeated fields on the given
+        schema path (the field itself included), outermost first. There is
+        one for every repetition level."""
+        names = path.split('.')
+        levels = []
+        for i in range(1, len(names) + 1):
+            id = self._path_to_id['.'.join(names[:i])]
+            element = self._schema_elements[id]
+            if element.repetition_type == FieldRepetitionType.REPEATED:
+                levels.append(self._def_level[id])
+        return levels
+
     def _rebuild_tree(self, fid, rep_level, def_level, path):
         parent = self._schema_elements[fid]
         if fid != SchemaHelper.ROOT_NODE:
@@ -0,0 +1,81 @@
+"""Positional (offset based) reads over a shared file.
+
+A PositionalFile reads byte ranges at explicit offsets, so any number of
+readers (or threads) can share one file handle without disturbing each
+other's position. Cursor wraps it in the small file-like interface (read,
+seek, tell) used by the page reading code, with a position of its own."""
+
+import os
+import threading
+
+
+class PositionalFile(object):
+    """Reads byte ranges of the file behind fo at explicit offsets.
+
+    os.pread is used when the platform has it and fo is backed by a file
+    descriptor. Otherwise each seek+read pair on fo is done under a lock."""
+
+    def __init__(self, fo):
+        self._fo = fo
+        self._lock = threading.Lock()
+        self._fd = None
+        if hasattr(os, 'pread'):
+            try:
+                self._fd = fo.fileno()
+            except (AttributeError, EnvironmentError, ValueError):
+                pass
+        with self._lock:
+            fo.seek(0, 2)
+            self.size = fo.tell()
+
+    def pread(self, offset, size):
+        """Returns up to size bytes starting at offset."""
+        if self._fd is not None:
+            return os.pread(self._fd, size, offset)
+        with self._lock:
+            self._fo.seek(offset, 0)
+            return self._fo.read(size)
+
+    def preadinto(self, offset, view):
+        """Reads up to len(view) bytes starting at offset into the writable
+        memoryview view, returning the number of bytes read."""
+        readinto = getattr(self._fo, 'readinto', None)
+        if self._fd is not None or readinto is None:
+            data = self.pread(offset, len(view))
+            view[:len(data)] = data
+            return len(data)
+        with self._lock:
+            self._fo.seek(offset, 0)
+            return readinto(view)
+
+
+class Cursor(object):
+    """File-like view of a PositionalFile with its own position."""
+
+    def __init__(self, source, offset=0):
+        self._source = source
+        self._pos = offset
+
+    def read(self, size=-1):
+        if size is None or size < 0:
+            size = self._source.size - self._pos
+        data = self._source.pread(self._pos, size)
+        self._pos += len(data)
+        return data
+
+    def readinto(self, view):
+        size = self._source.preadinto(self._pos, view)
+        self._pos += size
+        return size
+
+    def seek(self, offset, whence=0):
+        if whence == 1:
+            offset += self._pos
+        elif whence == 2:
+            offset += self._source.size
+        if offset < 0:
+            raise IOError("Invalid offset: {0}".format(offset))
+        self._pos = offset
+
+    def tell(self):
+        return self._pos
@@ -13,7 +13,11 @@ setup(name='parquet',
         'thrift',
     ],
     extras_require = {
-        'snappy support': ['python-snappy']
+        'snappy support': ['python-snappy'],
+        'lz4 support': ['lz4'],
+        'zstd support': ['zstandard'],
+        'lzo support': ['python-lzo'],
+        'numpy support': ['numpy'],
     },
     entry_points={
         'console_scripts': [
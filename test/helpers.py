@@ -0,0 +1,76 @@
+"""Helpers shared by the tests: running tests both with the numpy code paths
+of parquet and with their fallbacks for a missing numpy, and decoding
+synthetic data pages."""
+
+import parquet
+import parquet.columns
+import parquet.converters
+import parquet.encoding
+from parquet.schema import SchemaHelper
+from parquet.ttypes import (ColumnMetaData, DataPageHeader, Encoding,
+                            FieldRepetitionType, PageHeader, PageType,
+                            SchemaElement)
+from nose import SkipTest
+
+# the modules that use numpy when it's available.
+NUMPY_MODULES = [parquet.encoding, parquet.columns, parquet.converters]
+
+
+def without_numpy(test):
+    """Runs test with the fallbacks for a missing numpy."""
+    saved = [m.numpy for m in NUMPY_MODULES]
+    for m in NUMPY_MODULES:
+        m.numpy = None
+    try:
+        return test()
+    finally:
+        for m, numpy in zip(NUMPY_MODULES, saved):
+            m.numpy = numpy
+
+
+def requires_numpy():
+    """Skips the calling test if numpy is not available."""
+    if parquet.encoding.numpy is None:
+        raise SkipTest("numpy is not available")
+
+
+class NumpyAndFallback(object):
+    """Mixin for test cases whose _check is run both with numpy (skipped if
+    it's not available) and with the fallbacks for a missing numpy."""
+
+    def test_numpy(self):
+        requires_numpy()
+        self._check()
+
+    def test_array(self):
+        without_numpy(self._check)
+
+
+def leaf(name, type_, repetition_type=FieldRepetitionType.REQUIRED,
+         **kwargs):
+    """Returns the SchemaElement of a leaf column."""
+    return SchemaElement(name=name, type=type_,
+                         repetition_type=repetition_type, **kwargs)
+
+
+def column_metadata(element):
+    """Returns the ColumnMetaData of a chunk of the leaf column element."""
+    return ColumnMetaData(type=element.type, path_in_schema=[element.name])
+
+
+def decode_page(element, data, num_values, encoding=Encoding.PLAIN,
+                dictionary=None, **kwargs):
+    """Decodes data as a data page of num_values values of the column of a
+    schema holding just the leaf element, returning its values. kwargs are
+    passed on to parquet._decode_data_page."""
+    schema_helper = SchemaHelper([SchemaElement(name="m", num_children=1),
+                                  element])
+    ph = PageHeader(type=PageType.DATA_PAGE,
+                    uncompressed_page_size=len(data),
+                    data_page_header=DataPageHeader(
+                        num_values=num_values, encoding=encoding,
+                        definition_level_encoding=Encoding.RLE,
+                        repetition_level_encoding=Encoding.RLE))
+    return parquet._decode_data_page(data, schema_helper, ph,
+                                     column_metadata(element), dictionary,
+                                     **kwargs)[2]
@@ -0,0 +1,133 @@
+import sys
+import unittest
+
+import parquet
+from parquet.cache import LRUCache
+
+
+class TestLRUCache(unittest.TestCase):
+
+    def test_hit_miss(self):
+        c = LRUCache(max_entries=2, max_bytes=100)
+        self.assertEquals(None, c.get("a"))
+        c.put("a", 1, 10)
+        self.assertEquals(1, c.get("a"))
+        stats = c.stats()
+        self.assertEquals(1, stats['hits'])
+        self.assertEquals(1, stats['misses'])
+        self.assertEquals(10, stats['bytes'])
+
+    def test_evicts_least_recently_used(self):
+        c = LRUCache(max_entries=2, max_bytes=100)
+        c.put("a", 1, 10)
+        c.put("b", 2, 10)
+        c.get("a")
+        c.put("c", 3, 10)
+        self.assertEquals(None, c.get("b"))
+        self.assertEquals(1, c.get("a"))
+        self.assertEquals(3, c.get("c"))
+        self.assertEquals(1, c.stats()['evictions'])
+
+    def test_evicts_by_bytes(self):
+        c = LRUCache(max_entries=10, max_bytes=25)
+        c.put("a", 1, 10)
+        c.put("b", 2, 10)
+        c.put("c", 3, 10)
+        self.assertEquals(2, len(c))
+        self.assertEquals(20, c.stats()['bytes'])
+        self.assertEquals(None, c.get("a"))
+
+    def test_too_large(self):
+        c = LRUCache(max_entries=10, max_bytes=5)
+        c.put("a", 1, 10)
+        self.assertEquals(0, len(c))
+
+
+class TestFooterCache(unittest.TestCase):
+
+    f = "test-data/nation.impala.parquet"
+
+    def setUp(self):
+        parquet.cache.footer_cache.clear()
+
+    def test_read_footer_cached(self):
+        footer = parquet.read_footer(self.f)
+        self.assertTrue(parquet.read_footer(self.f) is footer)
+        stats = parquet.cache.footer_cache.stats()
+        self.assertEquals(1, stats['hits'])
+        self.assertEquals(1, stats['misses'])
+
+    def test_footer_size(self):
+        with open(self.f, 'rb') as fo:
+            footer_bytes = parquet._read_footer_bytes(fo)[0]
+        footer = parquet.read_footer(self.f)
+        size = parquet.cache.approximate_size(footer)
+        self.assertTrue(size > 2 * len(footer_bytes))
+        self.assertTrue(parquet.cache.footer_cache.stats()['bytes'] > size)
+
+    def test_entry_size(self):
+        for lazy in (False, True):
+            with open(self.f, 'rb') as fo:
+                entry = parquet._read_footer_entry(fo, lazy=lazy)
+            # the index is built, and measured, before the entry is cached.
+            self.assertTrue(entry._index is not None)
+            cached = parquet.cache.footer_cache.stats()['bytes']
+            for rg in entry.footer.row_groups:
+                list(rg.columns)
+            self.assertTrue(
+                cached >= 0.8 * parquet.cache.approximate_size(entry))
+            parquet.cache.footer_cache.clear()
+
+    def test_index_cached(self):
+        with open(self.f, 'rb') as fo:
+            index = parquet.FileReader(fo)._index
+        with open(self.f, 'rb') as fo:
+            self.assertTrue(parquet.FileReader(fo)._index is index)
+
+    def test_approximate_size_sampled(self):
+        items = [[float(i)] for i in xrange(1000)]
+        self.assertEquals(
+            sys.getsizeof(items) +
+            1000 * (sys.getsizeof([0.5]) + sys.getsizeof(0.5)),
+            parquet.cache.approximate_size(items))
+
+    def test_file_reader_cached(self):
+        footer = parquet.read_footer(self.f)
+        with open(self.f, 'rb') as fo:
+            reader = parquet.FileReader(fo)
+        self.assertTrue(reader._footer is footer)
+
+
+class TestPageCache(unittest.TestCase):
+
+    f = "test-data/gzip-nation.impala.parquet"
+
+    def setUp(self):
+        parquet.cache.page_cache.clear()
+
+    def tearDown(self):
+        parquet.cache.page_cache.clear()
+
+    def _read(self, column, **kwargs):
+        with open(self.f, 'rb') as fo:
+            reader = parquet.FileReader(fo, **kwargs)
+            return list(reader.column_reader(column).read())
+
+    def test_pages_cached(self):
+        expected = self._read("n_name")
+        self.assertEquals(0, len(parquet.cache.page_cache))
+        self.assertEquals(expected, self._read("n_name", page_cache=True))
+        stats = parquet.cache.page_cache.stats()
+        self.assertEquals(0, stats['hits'])
+        self.assertTrue(stats['entries'] > 0)
+        self.assertEquals(expected, self._read("n_name", page_cache=True))
+        self.assertEquals(stats['entries'],
+                          parquet.cache.page_cache.stats()['hits'])
+
+    def test_dictionary_cached(self):
+        with open("test-data/nation.dict.parquet", 'rb') as fo:
+            reader = parquet.FileReader(fo, page_cache=True)
+            expected = list(reader.column_reader("name").read())
+            self.assertEquals(expected,
+                              list(reader.column_reader("name").read()))
+        self.assertEquals(1, parquet.cache.page_cache.stats()['hits'])
@@ -0,0 +1,124 @@
+import os
+import unittest
+
+from thrift.protocol import TCompactProtocol
+from thrift.transport import TTransport
+
+import parquet
+from parquet import compact
+from parquet.ttypes import (DataPageHeader, DataPageHeaderV2,
+                            DictionaryPageHeader, FileMetaData, PageHeader,
+                            PageType, Statistics)
+
+
+def _serialize(obj):
+    tout = TTransport.TMemoryBuffer()
+    obj.write(TCompactProtocol.TCompactProtocol(tout))
+    return tout.getvalue()
+
+
+def _thrift_decode(cls, data):
+    obj = cls()
+    obj.read(TCompactProtocol.TCompactProtocol(TTransport.TMemoryBuffer(data)))
+    return obj
+
+
+class TestPrimitives(unittest.TestCase):
+
+    def test_varint(self):
+        self.assertEquals((0x7F, 1), compact.read_varint("\x7f", 0))
+        self.assertEquals((300, 3), compact.read_varint("x\xac\x02", 1))
+
+    def test_zigzag(self):
+        self.assertEquals((-1, 1), compact.read_zigzag("\x01", 0))
+        self.assertEquals((1, 1), compact.read_zigzag("\x02", 0))
+
+    def test_truncated_binary(self):
+        self.assertRaises(IndexError, compact.read_binary, "\x05ab", 0)
+
+
+class TestReadStruct(unittest.TestCase):
+
+    def _check(self, obj):
+        data = _serialize(obj)
+        decoded, pos = compact.read_struct(data, 0, obj.__class__)
+        self.assertEquals(len(data), pos)
+        self.assertEquals(_thrift_decode(obj.__class__, data), decoded)
+        self.assertEquals(obj, decoded)
+        decoded, _ = compact.read_struct(memoryview(data), 0, obj.__class__)
+        self.assertEquals(obj, decoded)
+
+    def test_data_page_header(self):
+        self._check(PageHeader(
+            type=PageType.DATA_PAGE, uncompressed_page_size=1000,
+            compressed_page_size=-5, crc=12345,
+            data_page_header=DataPageHeader(
+                num_values=100, encoding=0, definition_level_encoding=3,
+                repetition_level_encoding=3,
+                statistics=Statistics(max="z" * 300, min="a",
+                                      null_count=2 ** 40,
+                                      distinct_count=7))))
+
+    def test_dictionary_page_header(self):
+        for is_sorted in (True, False):
+            self._check(PageHeader(
+                type=PageType.DICTIONARY_PAGE, uncompressed_page_size=10,
+                compressed_page_size=10,
+                dictionary_page_header=DictionaryPageHeader(
+                    num_values=3, encoding=2, is_sorted=is_sorted)))
+
+    def test_data_page_header_v2(self):
+        self._check(PageHeader(
+            type=PageType.DATA_PAGE_V2, uncompressed_page_size=10,
+            compressed_page_size=10,
+            data_page_header_v2=DataPageHeaderV2(
+                num_values=3, num_nulls=0, num_rows=3, encoding=0,
+                definition_levels_byte_length=0,
+                repetition_levels_byte_length=0, is_compressed=False)))
+
+    def test_footers(self):
+        for f in os.listdir("test-data"):
+            if not f.endswith(".parquet"):
+                continue
+            with open(os.path.join("test-data", f), 'rb') as fo:
+                data, _ = parquet._read_footer_bytes(fo)
+            self.assertEquals(_thrift_decode(FileMetaData, data),
+                              compact.read_struct(data, 0, FileMetaData)[0])
+
+
+class TestFastDecoderSwitch(unittest.TestCase):
+
+    def tearDown(self):
+        parquet.FAST_DECODER = True
+
+    def _page_headers(self, f):
+        footer = parquet.read_footer(f)
+        headers = []
+        with open(f, 'rb') as fo:
+            for rg in footer.row_groups:
+                for cc in rg.columns:
+                    fo.seek(parquet._get_offset(cc.meta_data), 0)
+                    ph = parquet._read_page_header(fo)
+                    headers.append((ph, fo.tell()))
+        return headers
+
+    def test_page_headers_match_thrift(self):
+        for f in ["test-data/nation.impala.parquet",
+                  "test-data/nation.dict.parquet",
+                  "test-data/firewall.parquet"]:
+            parquet.FAST_DECODER = False
+            expected = self._page_headers(f)
+            parquet.FAST_DECODER = True
+            self.assertEquals(expected, self._page_headers(f))
+
+    def test_large_page_header(self):
+        ph = PageHeader(
+            type=PageType.DATA_PAGE, uncompressed_page_size=1,
+            compressed_page_size=1,
+            data_page_header=DataPageHeader(
+                num_values=1, encoding=0, definition_level_encoding=3,
+                repetition_level_encoding=3,
+                statistics=Statistics(max="z" * 5000, min="a")))
+        fo = TTransport.StringIO(_serialize(ph) + "X")
+        self.assertEquals(ph, parquet._read_page_header(fo))
+        self.assertEquals("X", fo.read())
@@ -0,0 +1,54 @@
+import struct
+import unittest
+import zlib
+
+from parquet import compression
+from parquet.ttypes import CompressionCodec
+
+
+def _gzip(data):
+    c = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    return c.compress(data) + c.flush()
+
+
+class TestCodecs(unittest.TestCase):
+
+    def test_gzip(self):
+        decompress = compression.decompressor(CompressionCodec.GZIP)
+        data = "parquet" * 100
+        self.assertEquals(data, decompress(_gzip(data), len(data)))
+        self.assertEquals(data, decompress(buffer(_gzip(data)), len(data)))
+
+    def test_gzip_members(self):
+        decompress = compression.decompressor(CompressionCodec.GZIP)
+        self.assertEquals("abcdef",
+                          decompress(_gzip("abc") + _gzip("def"), 6))
+
+    def test_empty_gzip(self):
+        decompress = compression.decompressor(CompressionCodec.GZIP)
+        self.assertEquals("", decompress(_gzip(""), 0))
+
+    def test_register(self):
+        self.assertEquals(None, compression.decompressor(42))
+        compression.register(42, lambda data, size: data[::-1])
+        try:
+            self.assertEquals("cba", compression.decompressor(42)("abc", 3))
+        finally:
+            del compression._DECOMPRESSORS[42]
+
+    def test_codec_name(self):
+        self.assertEquals("GZIP",
+                          compression.codec_name(CompressionCodec.GZIP))
+        self.assertEquals("ZSTD", compression.codec_name(compression.ZSTD))
+
+    def test_hadoop_framed(self):
+        seen = []
+
+        def block(data, size):
+            seen.append(size)
+            return data.upper()
+        decompress = compression.hadoop_framed(block)
+        framed = (struct.pack(">II", 5, 2) + "ab" + struct.pack(">I", 3) +
+                  "cde" + struct.pack(">II", 1, 1) + "f")
+        self.assertEquals("ABCDEF", decompress(framed, 6))
+        self.assertEquals([5, 3, 1], seen)
@@ -0,0 +1,140 @@
+import datetime
+import decimal
+import struct
+import unittest
+
+import parquet.converters
+import parquet.encoding
+from parquet.converters import DATE, TIMESTAMP_MILLIS
+from parquet.ttypes import ConvertedType, SchemaElement, Type
+from helpers import requires_numpy, without_numpy
+
+
+class TestUtf8(unittest.TestCase):
+
+    def _array(self, values):
+        data = "".join(struct.pack("<i", len(v)) + v for v in values)
+        return parquet.encoding.read_plain_byte_array_batch(
+            data, len(values))[0]
+
+    def test_ascii(self):
+        values = parquet.converters.utf8(self._array(["foo", "", "bar"]))
+        self.assertEquals([u"foo", u"", u"bar"], values)
+        self.assertTrue(all(isinstance(v, unicode) for v in values))
+
+    def test_non_ascii(self):
+        values = [u"gr\xfc\xdf", u"\u20ac", u"x"]
+        encoded = [v.encode('utf-8') for v in values]
+        self.assertEquals(values,
+                          parquet.converters.utf8(self._array(encoded)))
+        self.assertEquals(values, parquet.converters.utf8(encoded))
+
+
+class TestDecimal(unittest.TestCase):
+
+    def test_ints_float(self):
+        requires_numpy()
+        values = parquet.converters.decimal_from_ints(
+            parquet.encoding.read_plain_batch(
+                struct.pack("<3i", 12345, -5, 0), Type.INT32, 3), 2,
+            as_float=True)
+        self.assertEquals("float64", str(values.dtype))
+        self.assertEquals([123.45, -0.05, 0.0], values.tolist())
+
+    def test_ints_decimal(self):
+        expected = [decimal.Decimal("123.45"), decimal.Decimal("-0.05")]
+        self.assertEquals(
+            expected,
+            parquet.converters.decimal_from_ints([12345, -5], 2))
+        values = parquet.converters.decimal_from_ints(
+            parquet.encoding.read_plain_batch(
+                struct.pack("<2q", 12345678901234567, -5), Type.INT64, 2), 2)
+        self.assertEquals([decimal.Decimal("123456789012345.67"),
+                           decimal.Decimal("-0.05")], values)
+        without_numpy(lambda: self.assertEquals(
+            expected, parquet.converters.decimal_from_ints([12345, -5], 2)))
+        without_numpy(lambda: self.assertEquals(
+            [123.45, -0.05], parquet.converters.decimal_from_ints(
+                [12345, -5], 2, as_float=True)))
+
+    def test_fixed(self):
+        values = ["\x00\x30\x39", "\xff\xff\xfb", "\x80\x00\x00"]
+        expected = [decimal.Decimal("123.45"), decimal.Decimal("-0.05"),
+                    decimal.Decimal("-83886.08")]
+        self.assertEquals(expected, parquet.converters.decimal_from_fixed(
+            values, 3, 2))
+        without_numpy(lambda: self.assertEquals(
+            expected,
+            parquet.converters.decimal_from_fixed(values, 3, 2)))
+        self.assertEquals(
+            [decimal.Decimal(1), decimal.Decimal(-1)],
+            parquet.converters.decimal_from_fixed(
+                ["\x00" * 15 + "\x01", "\xff" * 16], 16, 0))
+
+    def test_precision_38(self):
+        unscaled = 12345678901234567890123456789012345678
+        expected = [decimal.Decimal("123456789012345678901234567890123456.78"),
+                    decimal.Decimal("-0.01")]
+        fixed = [("%032x" % unscaled).decode("hex"), "\xff" * 16]
+        self.assertEquals(expected, parquet.converters.decimal_from_fixed(
+            fixed, 16, 2))
+        self.assertEquals(expected, parquet.converters.decimal_from_ints(
+            [unscaled, -1], 2))
+        self.assertEquals(str(expected[0]), str(
+            parquet.converters.decimal_from_ints([unscaled], 2)[0]))
+
+    def test_fixed_float(self):
+        requires_numpy()
+        values = parquet.converters.decimal_from_fixed(
+            ["\x00\x30\x39", "\xff\xff\xfb"], 3, 2, as_float=True)
+        self.assertEquals([123.45, -0.05], values.tolist())
+
+
+class TestDatetimes(unittest.TestCase):
+
+    def test_dates(self):
+        requires_numpy()
+        values = parquet.converters.dates([0, 10957, -1])
+        self.assertEquals(["1970-01-01", "2000-01-01", "1969-12-31"],
+                          [str(v) for v in values])
+
+    def test_dates_without_numpy(self):
+        without_numpy(lambda: self.assertEquals(
+            [datetime.date(1970, 1, 1), datetime.date(2000, 1, 1)],
+            parquet.converters.dates([0, 10957])))
+
+    def test_timestamps_millis(self):
+        requires_numpy()
+        values = parquet.converters.timestamps_millis([946684800123])
+        self.assertEquals("datetime64[ms]", str(values.dtype))
+        self.assertEquals("2000-01-01T00:00:00.123", str(values[0]))
+        without_numpy(lambda: self.assertEquals(
+            [datetime.datetime(2000, 1, 1, 0, 0, 0, 123000)],
+            parquet.converters.timestamps_millis([946684800123])))
+
+
+class TestConverter(unittest.TestCase):
+
+    def test_lookup(self):
+        self.assertEquals(None, parquet.converters.converter(
+            SchemaElement(type=Type.INT32)))
+        self.assertEquals(None, parquet.converters.converter(
+            SchemaElement(type=Type.INT32,
+                          converted_type=ConvertedType.UTF8)))
+        self.assertEquals(
+            [decimal.Decimal("1.5")],
+            parquet.converters.convert([15], SchemaElement(
+                type=Type.INT64, converted_type=ConvertedType.DECIMAL,
+                scale=1, precision=9)))
+        self.assertEquals([1.5], list(parquet.converters.convert(
+            [15], SchemaElement(type=Type.INT64,
+                                converted_type=ConvertedType.DECIMAL,
+                                scale=1, precision=9),
+            decimals_as_float=True)))
+        without_numpy(lambda: self.assertEquals(
+            [datetime.date(2000, 1, 1)],
+            parquet.converters.convert([10957], SchemaElement(
+                type=Type.INT32, converted_type=DATE))))
+        self.assertTrue(parquet.converters.converter(SchemaElement(
+            type=Type.INT64, converted_type=TIMESTAMP_MILLIS)) is
+            parquet.converters.timestamps_millis)
@@ -1,11 +1,64 @@
 import array
+import pickle
 import struct
 import StringIO
 import unittest
 
+import parquet.columns
 import parquet.encoding
 from parquet.ttypes import Type
-from nose import SkipTest
+from helpers import NumpyAndFallback, requires_numpy, without_numpy
+
+
+def varint(n):
+    out = ""
+    while n > 0x7F:
+        out += chr(n & 0x7F | 0x80)
+        n >>= 7
+    return out + chr(n)
+
+
+def zigzag(n):
+    return varint((n << 1) ^ (n >> 63))
+
+
+def pack_bits(values, width):
+    """Packs values LSB first, padded to a whole number of groups of 8."""
+    values = values + [0] * (-len(values) % 8)
+    word = 0
+    for i, v in enumerate(values):
+        word |= v << (i * width)
+    return "".join(chr((word >> (8 * i)) & 0xFF)
+                   for i in range(len(values) * width / 8))
+
+
+def bit_pack(values, width):
+    """Packs values as a bit-packed run of the rle/bit-packed hybrid."""
+    values = values + [0] * (-len(values) % 8)
+    return varint(len(values) / 8 << 1 | 1) + pack_bits(values, width)
+
+
+def delta_binary_pack(values, block_size=128, miniblocks=4):
+    """Encodes values with the DELTA_BINARY_PACKED encoding."""
+    per_miniblock = block_size / miniblocks
+    out = (varint(block_size) + varint(miniblocks) + varint(len(values)) +
+           zigzag(values[0] if values else 0))
+    deltas = [b - a for a, b in zip(values, values[1:])]
+    for start in range(0, len(deltas), block_size):
+        block = deltas[start:start + block_size]
+        min_delta = min(block)
+        block = [d - min_delta for d in block]
+        bodies = []
+        widths = []
+        for m in range(0, len(block), per_miniblock):
+            miniblock = block[m:m + per_miniblock]
+            width = max(miniblock).bit_length()
+            miniblock += [0] * (per_miniblock - len(miniblock))
+            widths.append(width)
+            bodies.append(pack_bits(miniblock, width))
+        widths += [0] * (miniblocks - len(widths))
+        out += zigzag(min_delta) + "".join(map(chr, widths)) + "".join(bodies)
+    return out
 
 
 class TestPlain(unittest.TestCase):
@@ -62,6 +115,44 @@ class TestPlain(unittest.TestCase):
                 fo, Type.FIXED_LEN_BYTE_ARRAY, 3))
 
 
+class TestPlainBatch(NumpyAndFallback, unittest.TestCase):
+
+    cases = [(Type.INT32, "<i", [1, -2, 1 << 30]),
+             (Type.INT64, "<q", [1, -2, 1 << 40]),
+             (Type.FLOAT, "<f", [1.5, -2.25, 0.0]),
+             (Type.DOUBLE, "<d", [9.99, -1e100, 0.0])]
+
+    def _check(self):
+        for type_, fmt, values in self.cases:
+            data = "xx" + "".join(struct.pack(fmt, v) for v in values)
+            for buf in (data, buffer(data), memoryview(data)):
+                self.assertEquals(
+                    values[1:], parquet.encoding.read_plain_batch(
+                        buf, type_, 2, 2 + struct.calcsize(fmt)).tolist())
+            self.assertRaises(ValueError, parquet.encoding.read_plain_batch,
+                              data, type_, 4, 2)
+
+    def test_no_int64_typecode(self):
+        # e.g. python 2 on windows, where a C long is 4 bytes.
+        types = parquet.encoding.FIXED_WIDTH_TYPES
+        saved = parquet.columns.INT64_TYPECODE, types[Type.INT64]
+        parquet.columns.INT64_TYPECODE = None
+        types[Type.INT64] = (saved[1][0], None)
+        try:
+            data = struct.pack("<2q", 1, -2)
+            if parquet.encoding.numpy is not None:
+                self.assertEquals([1, -2], parquet.encoding.read_plain_batch(
+                    data, Type.INT64, 2).tolist())
+            self.assertRaises(NotImplementedError, without_numpy,
+                              lambda: parquet.encoding.read_plain_batch(
+                                  data, Type.INT64, 2))
+            self.assertEquals([1, 0], without_numpy(
+                lambda: parquet.encoding.read_plain_batch(
+                    data, Type.INT32, 2)).tolist())
+        finally:
+            parquet.columns.INT64_TYPECODE, types[Type.INT64] = saved
+
+
 class TestRle(unittest.TestCase):
 
     def testFourByteValue(self):
@@ -70,6 +161,256 @@ class TestRle(unittest.TestCase):
         self.assertEquals([1 << 30] * 2, list(out))
 
 
+class TestPlainFixedBatch(NumpyAndFallback, unittest.TestCase):
+
+    def _check(self):
+        data = "xabcdefgh"
+        values = parquet.encoding.read_plain_fixed_batch(data, 2, 3, 1)
+        self.assertEquals(["abc", "def"],
+                          [str(bytearray(v)) for v in values])
+        self.assertEquals(
+            ["abc", "def"],
+            parquet.encoding.read_plain_fixed_strs(data, 2, 3, 1))
+        self.assertEquals(["", ""],
+                          parquet.encoding.read_plain_fixed_strs(data, 2, 0))
+        self.assertRaises(ValueError,
+                          parquet.encoding.read_plain_fixed_batch,
+                          data, 3, 3, 1)
+
+    def test_numpy(self):
+        NumpyAndFallback.test_numpy(self)
+        values = parquet.encoding.read_plain_fixed_batch("abcdef", 2, 3)
+        self.assertEquals((2, 3), values.shape)
+        self.assertEquals(["abc", "def"], values.view("S3").ravel().tolist())
+
+
+class TestPlainBooleanBatch(NumpyAndFallback, unittest.TestCase):
+
+    values = [True, False, False, True, True, True, False, True, False, True]
+
+    def _check(self):
+        data = "x" + pack_bits([int(v) for v in self.values], 1) + "tail"
+        values, pos = parquet.encoding.read_plain_boolean_batch(
+            data, len(self.values), 1)
+        self.assertEquals(self.values, list(values))
+        self.assertEquals(3, pos)
+        self.assertEquals([], list(parquet.encoding.read_plain_boolean_batch(
+            data, 0, 3)[0]))
+        self.assertRaises(ValueError,
+                          parquet.encoding.read_plain_boolean_batch,
+                          data, 64, 1)
+
+
+class TestInt96TimestampBatch(unittest.TestCase):
+
+    # 1970-01-01, 2000-01-01 00:00:00.000000001 and 1969-12-31 12:00:00
+    timestamps = [(0, 2440588), (1, 2451545), (12 * 3600 * 10 ** 9, 2440587)]
+    expected = [0, 946684800000000001, -12 * 3600 * 10 ** 9]
+
+    def _data(self):
+        return "x" + "".join(struct.pack("<qi", nanos, day)
+                             for nanos, day in self.timestamps)
+
+    def test_numpy(self):
+        requires_numpy()
+        values = parquet.encoding.read_int96_timestamp_batch(
+            self._data(), 3, 1)
+        self.assertEquals("datetime64[ns]", str(values.dtype))
+        self.assertEquals(self.expected, values.view("i8").tolist())
+        self.assertEquals("2000-01-01T00:00:00.000000001", str(values[1]))
+
+    def test_array(self):
+        def check():
+            self.assertEquals(
+                self.expected,
+                parquet.encoding.read_int96_timestamp_batch(
+                    self._data(), 3, 1))
+        without_numpy(check)
+
+    def test_values_to_timestamps(self):
+        requires_numpy()
+        fo = StringIO.StringIO(self._data()[1:])
+        values = [parquet.encoding.read_plain_int96(fo) for _ in range(3)]
+        self.assertEquals(
+            self.expected,
+            list(parquet.encoding.int96_values_to_timestamps(values)
+                 .view("i8")))
+        self.assertRaises(ValueError,
+                          parquet.encoding.read_int96_timestamp_batch,
+                          self._data(), 4, 1)
+
+
+class TestRleBitPackedHybridBatch(NumpyAndFallback, unittest.TestCase):
+
+    def _check(self):
+        decode = parquet.encoding.read_rle_bit_packed_hybrid_batch
+        for width in (1, 3, 8, 13, 20, 31):
+            mask = (1 << width) - 1
+            short = [(i * 7919) & mask for i in range(13)]
+            long_ = [(i * 104729) & mask for i in range(200)]
+            data = ("xx" + varint(5 << 1) + struct.pack("<i", mask)[
+                :(width + 7) / 8] + bit_pack(short, width) +
+                bit_pack(long_, width))
+            expected = [mask] * 5 + short + [0] * 3 + long_
+            for buf in (data, buffer(data), memoryview(data)):
+                values = decode(buf, width, len(expected), 2)
+                self.assertEquals(expected, values.tolist())
+            # the trailing padding of the short run is cut off.
+            self.assertEquals(expected[:10],
+                              decode(data, width, 10, 2).tolist())
+            self.assertEquals(expected, decode(data, width, 1000, 2).tolist())
+
+    def test_matches_read_rle_bit_packed_hybrid(self):
+        data = varint(3 << 1) + "\x02" + bit_pack(range(8), 3)
+        expected = parquet.encoding.read_rle_bit_packed_hybrid(
+            StringIO.StringIO(data), 3, len(data))
+        actual = parquet.encoding.read_rle_bit_packed_hybrid_batch(data, 3, 11)
+        self.assertEquals(expected, actual.tolist())
+
+
+class TestDeltaBinaryPackedBatch(NumpyAndFallback, unittest.TestCase):
+
+    cases = [[7],
+             range(10),
+             [5, 3, -100, 1 << 40, 2, 2, 2] * 50,
+             [1000 + i * i for i in range(300)],
+             [(1 << 62) - 1, -(1 << 62), 0]]
+
+    def _check(self):
+        for values in self.cases:
+            data = "x" + delta_binary_pack(values) + "tail"
+            for buf in (data, buffer(data), memoryview(data)):
+                decoded, end = parquet.encoding.read_delta_binary_packed_batch(
+                    buf, 1)
+                self.assertEquals(values, decoded.tolist())
+                self.assertEquals("tail", data[end:])
+
+    def test_file_object(self):
+        fo = StringIO.StringIO(delta_binary_pack(range(0, 100, 3)) + "tail")
+        self.assertEquals(range(0, 100, 3),
+                          parquet.encoding.read_delta_binary_packed(fo))
+        self.assertEquals("tail", fo.read())
+
+
+class TestByteArrayBatch(NumpyAndFallback, unittest.TestCase):
+
+    values = ["foo", "", "foobar", "bar", "fo", "foo"]
+
+    def _check(self):
+        data = "x" + "".join(struct.pack("<i", len(v)) + v
+                             for v in self.values) + "tail"
+        for buf in (data, buffer(data), memoryview(data)):
+            array, end = parquet.encoding.read_plain_byte_array_batch(
+                buf, len(self.values), 1)
+            self.assertEquals(self.values, array.tolist())
+            self.assertEquals("tail", data[end:])
+        self.assertRaises(ValueError,
+                          parquet.encoding.read_plain_byte_array_batch,
+                          data, len(self.values) + 1, 1)
+        array, end = parquet.encoding.read_plain_byte_array_batch(data, 0, 1)
+        self.assertEquals(([], 1), (array.tolist(), end))
+
+        data = ("x" + delta_binary_pack(map(len, self.values)) +
+                "".join(self.values) + "tail")
+        fo = StringIO.StringIO(data)
+        fo.read(1)
+        self.assertEquals(self.values,
+                          parquet.encoding.read_delta_length_byte_array(fo))
+        for buf in (data, buffer(data), memoryview(data)):
+            array, end = parquet.encoding.read_delta_length_byte_array_batch(
+                buf, 1)
+            self.assertEquals(self.values, array.tolist())
+            self.assertEquals("tail", data[end:])
+
+
+class TestBinaryArray(NumpyAndFallback, unittest.TestCase):
+
+    values = ["foo", "", "foobar", "bar", "fo", "foo"]
+
+    def _array(self):
+        return parquet.encoding.read_delta_length_byte_array_batch(
+            delta_binary_pack(map(len, self.values)) + "".join(self.values))[0]
+
+    def _check(self):
+        array = self._array()
+        self.assertEquals(len(self.values), len(array))
+        self.assertEquals("foobar", array[2])
+        self.assertEquals("foo", array[-1])
+        self.assertRaises(IndexError, lambda: array[6])
+        self.assertEquals(self.values, list(array))
+        self.assertEquals([3, 0, 6, 3, 2, 3], list(array.lengths()))
+        self.assertEquals([True, False, False, False, False, True],
+                          list(array.equals("foo")))
+        self.assertEquals([True, False, True, False, False, True],
+                          list(array.startswith("foo")))
+        self.assertEquals([True] * 6, list(array.startswith("")))
+        self.assertEquals([False, True] + [False] * 4,
+                          list(array.equals("")))
+        self.assertEquals(array, pickle.loads(pickle.dumps(array, 2)))
+
+
+class TestDictionaryArray(NumpyAndFallback, unittest.TestCase):
+
+    dictionary = ["de", "fr", "nl", "fr"]
+
+    def _check(self):
+        codes = parquet.encoding.read_rle_bit_packed_hybrid_batch(
+            bit_pack([0, 1, 2, 1, 0, 3, 2, 0], 2), 2, 8)
+        array = parquet.columns.DictionaryArray(codes, self.dictionary)
+        self.assertEquals(1, array.codes.itemsize)
+        self.assertEquals(8, len(array))
+        self.assertEquals("nl", array[2])
+        self.assertEquals(["de", "fr", "nl", "fr", "de", "fr", "nl", "de"],
+                          list(array))
+        self.assertEquals([False, True, False, True, False, True, False,
+                           False], list(array.equals("fr")))
+        self.assertEquals([False] * 8, list(array.equals("be")))
+        self.assertEquals(array, pickle.loads(pickle.dumps(array, 2)))
+
+    def test_wide_codes(self):
+        array = parquet.columns.DictionaryArray([0, 300], range(301))
+        self.assertEquals(2, array.codes.itemsize)
+        self.assertEquals([0, 300], array.tolist())
+
+
+class TestValidity(NumpyAndFallback, unittest.TestCase):
+
+    def _check(self):
+        levels = parquet.encoding.read_rle_bit_packed_hybrid_batch(
+            bit_pack([1, 0, 1, 1, 0], 1), 1, 5)
+        valid, null_count = parquet.columns.validity(levels, 1)
+        self.assertEquals([True, False, True, True, False], list(valid))
+        self.assertEquals(2, null_count)
+        array = parquet.columns.NullableArray(["a", "b", "c"], valid,
+                                              null_count)
+        self.assertEquals(5, len(array))
+        self.assertEquals(["a", None, "b", "c", None], array.tolist())
+        self.assertEquals((None, 0), parquet.columns.validity([1, 1], 1))
+
+    def test_numpy(self):
+        NumpyAndFallback.test_numpy(self)
+        numpy = parquet.encoding.numpy
+        array = parquet.columns.NullableArray(
+            numpy.array([1.5, 2.5]), numpy.array([False, True, True]), 1)
+        masked = array.to_masked()
+        self.assertEquals([None, 1.5, 2.5], masked.tolist())
+
+    def test_single_run(self):
+        data = varint(8 << 1) + chr(1)
+        self.assertEquals(1, parquet.encoding.rle_run_value(data, 1, 8))
+        self.assertEquals(None, parquet.encoding.rle_run_value(data, 1, 9))
+        self.assertEquals(
+            None, parquet.encoding.rle_run_value(bit_pack([1] * 8, 1), 1, 8))
+        self.assertEquals((None, 0),
+                          parquet.columns.validity([1] * 8, 1, run_value=1))
+        valid, null_count = parquet.columns.validity([0] * 8, 1, run_value=0)
+        self.assertEquals(([False] * 8, 8), (list(valid), null_count))
+        array = parquet.columns.NullableArray([], valid, null_count)
+        self.assertEquals([None] * 8, array.tolist())
+        valid, null_count = parquet.columns.validity(None, 1, 0, count=3)
+        self.assertEquals(([False] * 3, 3), (list(valid), null_count))
+
+
 class TestVarInt(unittest.TestCase):
 
     def testSingleByte(self):
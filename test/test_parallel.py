@@ -0,0 +1,68 @@
+import threading
+import time
+import unittest
+
+import parquet
+from parquet import parallel
+
+
+class TestWorkerPool(unittest.TestCase):
+
+    def test_order(self):
+        def slow_square(i):
+            time.sleep(0.001 * (i % 3))
+            return i * i
+        workers = parallel.WorkerPool(4)
+        try:
+            self.assertEquals([i * i for i in range(50)],
+                              list(workers.imap(slow_square, range(50))))
+        finally:
+            workers.close()
+
+    def test_window(self):
+        in_flight = []
+        lock = threading.Lock()
+
+        def items():
+            for i in range(20):
+                with lock:
+                    in_flight.append(i)
+                yield i
+        workers = parallel.WorkerPool(2, window=3)
+        try:
+            results = workers.imap(lambda i: i, items())
+            self.assertEquals(0, next(results))
+            # three were submitted before the first result was collected.
+            self.assertEquals(3, len(in_flight))
+            self.assertEquals(range(1, 20), list(results))
+        finally:
+            workers.close()
+
+    def test_error(self):
+        def fail(i):
+            if i == 2:
+                raise ValueError(i)
+            return i
+        workers = parallel.WorkerPool(2)
+        try:
+            results = workers.imap(fail, range(5))
+            self.assertEquals([0, 1], [next(results), next(results)])
+            self.assertRaises(ValueError, next, results)
+        finally:
+            workers.close()
+
+
+class TestParallelReads(unittest.TestCase):
+
+    def test_same_values(self):
+        workers = parallel.WorkerPool(4)
+        try:
+            with open("test-data/gzip-nation.impala.parquet", 'rb') as fo:
+                reader = parquet.FileReader(fo)
+                parallel_reader = parquet.FileReader(fo, workers=workers)
+                for column in ["n_nationkey", "n_name", "n_comment"]:
+                    self.assertEquals(
+                        list(reader.column_reader(column).read()),
+                        list(parallel_reader.column_reader(column).read()))
+        finally:
+            workers.close()
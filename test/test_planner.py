@@ -0,0 +1,51 @@
+import StringIO
+import unittest
+
+import parquet
+from parquet.planner import IOPlanner
+
+
+class TestPlan(unittest.TestCase):
+
+    def test_merges_close_ranges(self):
+        planner = IOPlanner(max_gap=10, max_request=1000)
+        requests = planner.plan([("b", 105, 10), ("a", 0, 100),
+                                 ("c", 200, 10)])
+        self.assertEquals(2, len(requests))
+        self.assertEquals((0, 115), (requests[0].offset, requests[0].size))
+        self.assertEquals(["a", "b"], [r[0] for r in requests[0].ranges])
+        self.assertEquals((200, 10), (requests[1].offset, requests[1].size))
+
+    def test_max_request(self):
+        planner = IOPlanner(max_gap=10, max_request=150)
+        requests = planner.plan([("a", 0, 100), ("b", 100, 100),
+                                 ("c", 200, 400)])
+        self.assertEquals([100, 100, 400], [r.size for r in requests])
+
+
+class TestFetch(unittest.TestCase):
+
+    def test_fetch(self):
+        data = "".join(chr(i) for i in range(256))
+        fo = StringIO.StringIO(data)
+        planner = IOPlanner(max_gap=10, max_request=1000)
+        result = planner.fetch(fo, [("a", 0, 10), ("b", 15, 5),
+                                    ("c", 100, 3)])
+        self.assertEquals(data[0:10], result["a"].tobytes())
+        self.assertEquals(data[15:20], result["b"].tobytes())
+        self.assertEquals(data[100:103], result["c"].tobytes())
+        self.assertEquals({'requests': 2, 'bytes_read': 23,
+                           'bytes_overread': 5}, planner.stats())
+
+    def test_column_readers(self):
+        columns = ["DocId", "Links.Forward", "Name.Url"]
+        with open("test-data/example.parquet", 'rb') as fo:
+            reader = parquet.FileReader(fo)
+            expected = dict((c, list(reader.column_reader(c).read()))
+                            for c in columns)
+            planner = IOPlanner(max_gap=1024)
+            readers = reader.column_readers(columns, planner)
+            actual = dict((c, list(r.read())) for c, r in readers.items())
+        self.assertEquals(expected, actual)
+        self.assertEquals(1, planner.stats()['requests'])
+        self.assertTrue(planner.stats()['bytes_overread'] > 0)
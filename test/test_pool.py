@@ -0,0 +1,44 @@
+import unittest
+
+import parquet
+from parquet import pool
+
+
+class TestBufferPool(unittest.TestCase):
+
+    def test_buckets(self):
+        self.assertEquals(pool.MIN_BUCKET_SIZE, pool.bucket_size(1))
+        self.assertEquals(8192, pool.bucket_size(4097))
+        self.assertEquals(8192, pool.bucket_size(8192))
+
+    def test_reuse(self):
+        buffers = pool.BufferPool()
+        buf = buffers.acquire(5000)
+        self.assertEquals(8192, len(buf))
+        buffers.release(buf)
+        self.assertTrue(buffers.acquire(6000) is buf)
+        self.assertEquals(
+            {'allocations': 1, 'reuses': 1, 'bytes': 0}, buffers.stats())
+
+    def test_max_bytes(self):
+        buffers = pool.BufferPool(max_bytes=8192)
+        a, b, c = [buffers.acquire(10) for _ in range(3)]
+        for buf in (a, b, c):
+            buffers.release(buf)
+        self.assertEquals(8192, buffers.stats()['bytes'])
+        buffers.clear()
+        self.assertEquals(0, buffers.stats()['bytes'])
+
+
+class TestPooledReads(unittest.TestCase):
+
+    def test_pages_reuse_buffers(self):
+        before = pool.page_buffers.stats()
+        with open("test-data/nation.impala.parquet", 'rb') as fo:
+            reader = parquet.FileReader(fo)
+            values = list(reader.column_reader("n_name").read())
+            self.assertEquals(25, len(values))
+            self.assertEquals(values,
+                              list(reader.column_reader("n_name").read()))
+        after = pool.page_buffers.stats()
+        self.assertTrue(after['reuses'] > before['reuses'])
@@ -0,0 +1,76 @@
+import threading
+import time
+import unittest
+
+import parquet
+from parquet.prefetch import Prefetcher
+
+
+class TestPrefetcher(unittest.TestCase):
+
+    def test_order(self):
+        prefetcher = Prefetcher(depth=3)
+        self.assertEquals(range(100),
+                          list(prefetcher.prefetch(xrange(100), lambda i: 1)))
+
+    def test_bounded(self):
+        produced = []
+
+        def items():
+            for i in range(10):
+                produced.append(i)
+                yield "x" * 10
+        # depth allows 4 items, but the byte budget only 2 of them.
+        results = Prefetcher(depth=4, max_bytes=20).prefetch(items())
+        self.assertEquals("x" * 10, next(results))
+        time.sleep(0.2)
+        # the one taken, two queued and one waiting for room.
+        self.assertTrue(len(produced) <= 4)
+        self.assertEquals(9, len(list(results)))
+
+    def test_large_item(self):
+        results = Prefetcher(max_bytes=1).prefetch(["abc", "defg"])
+        self.assertEquals(["abc", "defg"], list(results))
+
+    def test_error(self):
+        def items():
+            yield 1
+            raise IOError("boom")
+        results = Prefetcher().prefetch(items(), lambda i: 1)
+        self.assertEquals(1, next(results))
+        self.assertRaises(IOError, next, results)
+
+    def test_close_early(self):
+        stopped = threading.Event()
+
+        def items():
+            try:
+                i = 0
+                while True:
+                    yield i
+                    i += 1
+            finally:
+                stopped.set()
+        results = Prefetcher(depth=2).prefetch(items(), lambda i: 1)
+        self.assertEquals(0, next(results))
+        results.close()
+        self.assertTrue(stopped.wait(5))
+
+    def test_depth(self):
+        self.assertRaises(ValueError, Prefetcher, 0)
+
+
+class TestPrefetchedReads(unittest.TestCase):
+
+    columns = ["DocId", "Links.Backward", "Links.Forward",
+               "Name.Language.Code", "Name.Language.Country", "Name.Url"]
+
+    def test_same_values(self):
+        for prefetcher in (Prefetcher(depth=1), Prefetcher(decompress=False)):
+            with open("test-data/example.parquet", 'rb') as fo:
+                reader = parquet.FileReader(fo)
+                prefetched = parquet.FileReader(fo, prefetcher=prefetcher)
+                for column in self.columns:
+                    self.assertEquals(
+                        list(reader.column_reader(column).read()),
+                        list(prefetched.column_reader(column).read()))
@@ -1,11 +1,17 @@
+import copy
 import csv
 import json
 import os
 import StringIO
+import struct
 import tempfile
 import unittest
 
 import parquet
+from parquet.columns import BinaryArray, DictionaryArray
+from parquet.ttypes import (ConvertedType, Encoding, FieldRepetitionType,
+                            PageType, Type)
+from helpers import column_metadata, decode_page, leaf, without_numpy
 
 
 class TestFileFormat(unittest.TestCase):
@@ -28,6 +34,28 @@ class TestFileFormat(unittest.TestCase):
             self.assertFalse(parquet._check_header_magic_bytes(t))
             self.assertFalse(parquet._check_footer_magic_bytes(t))
 
+    def test_invalid_footer_size(self):
+        for footer_size in [-5, 1000]:
+            fo = StringIO.StringIO("PAR1" + "x" * 16 +
+                                   struct.pack("<i", footer_size) + "PAR1")
+            self.assertRaises(parquet.ParquetFormatException,
+                              parquet._read_footer, fo)
+
+
+class CountingFile(object):
+    """Wraps a file object, counting the calls to read."""
+
+    def __init__(self, fo):
+        self._fo = fo
+        self.reads = 0
+
+    def read(self, *args):
+        self.reads += 1
+        return self._fo.read(*args)
+
+    def __getattr__(self, name):
+        return getattr(self._fo, name)
+
 
 class TestMetadata(unittest.TestCase):
 
@@ -44,18 +72,413 @@ class TestMetadata(unittest.TestCase):
             set(["schema", "n_regionkey", "n_name", "n_nationkey",
                  "n_comment"]))
 
+    def test_read_footer_single_read(self):
+        with open(self.f, 'rb') as fo:
+            counting = CountingFile(fo)
+            footer = parquet._read_footer(counting)
+            self.assertEquals(1, counting.reads)
+            self.assertEquals(25, footer.num_rows)
+
+    def test_read_footer_small_tail(self):
+        with open(self.f, 'rb') as fo:
+            counting = CountingFile(fo)
+            footer = parquet._read_footer(counting, tail_size=64)
+            self.assertEquals(2, counting.reads)
+            self.assertEquals(parquet.read_footer(self.f), footer)
+
+    def test_read_footer_not_parquet(self):
+        with tempfile.NamedTemporaryFile() as t:
+            t.write("PAR1_some_bogus_data")
+            t.flush()
+            self.assertRaises(parquet.ParquetFormatException,
+                              parquet.read_footer, t.name)
+
     def test_dump_metadata(self):
         data = StringIO.StringIO()
         parquet.dump_metadata(self.f, data)
 
 
+class TestLazyMetadata(unittest.TestCase):
+
+    files = ["nation.impala.parquet", "nation.dict.parquet",
+             "example.parquet", "firewall.parquet"]
+
+    def test_lazy_matches_eager(self):
+        for f in self.files:
+            with open(os.path.join("test-data", f), 'rb') as fo:
+                eager = parquet._read_footer(fo)
+                lazy = parquet._read_footer(fo, lazy=True)
+            self.assertEquals(eager.version, lazy.version)
+            self.assertEquals(eager.schema, lazy.schema)
+            self.assertEquals(eager.num_rows, lazy.num_rows)
+            self.assertEquals(eager.key_value_metadata,
+                              lazy.key_value_metadata)
+            self.assertEquals(eager.created_by, lazy.created_by)
+            self.assertEquals(len(eager.row_groups), len(lazy.row_groups))
+            for rg, lazy_rg in zip(eager.row_groups, lazy.row_groups):
+                self.assertEquals(rg.num_rows, lazy_rg.num_rows)
+                self.assertEquals(rg.total_byte_size, lazy_rg.total_byte_size)
+                self.assertEquals(rg.columns, list(lazy_rg.columns))
+
+    def test_column_reader_decodes_one_chunk(self):
+        parquet.cache.footer_cache.clear()
+        with open("test-data/nation.impala.parquet", 'rb') as fo:
+            reader = parquet.FileReader(fo, lazy=True)
+            columns = reader._footer.row_groups[0].columns
+            self.assertEquals(0, columns.num_decoded())
+            reader.column_reader("n_name")
+            self.assertEquals(1, columns.num_decoded())
+            self.assertEquals(["n_name"], columns[1].meta_data.path_in_schema)
+
+
+class TestColumnChunkIndex(unittest.TestCase):
+
+    def test_index_matches_footer(self):
+        for lazy in (False, True):
+            with open("test-data/example.parquet", 'rb') as fo:
+                reader = parquet.FileReader(fo, lazy=lazy)
+            index = reader._index
+            self.assertEquals(6, index.num_columns)
+            self.assertEquals(1, index.num_row_groups)
+            for rg_idx, rg in enumerate(reader._footer.row_groups):
+                for column, cc in enumerate(rg.columns):
+                    cmd = cc.meta_data
+                    self.assertEquals(
+                        column, index.column(".".join(cmd.path_in_schema)))
+                    self.assertEquals(
+                        (parquet._get_offset(cmd), cmd.total_compressed_size,
+                         cmd.num_values, cmd.codec),
+                        index.chunk(rg_idx, column))
+
+    def test_unknown_column(self):
+        with open("test-data/nation.impala.parquet", 'rb') as fo:
+            reader = parquet.FileReader(fo)
+        self.assertFalse("nope" in reader._index)
+        self.assertRaises(KeyError, reader.column_reader, "nope")
+
+
+class TestCoalescedReads(unittest.TestCase):
+
+    columns = ["DocId", "Links.Backward", "Links.Forward",
+               "Name.Language.Code", "Name.Language.Country", "Name.Url"]
+
+    def _read(self, f, column, **kwargs):
+        with open(f, 'rb') as fo:
+            counting = CountingFile(fo)
+            reader = parquet.FileReader(counting, **kwargs)
+            counting.reads = 0
+            values = list(reader.column_reader(column).read())
+            return values, counting.reads
+
+    def test_same_values(self):
+        for column in self.columns:
+            expected, _ = self._read("test-data/example.parquet", column)
+            actual, reads = self._read("test-data/example.parquet", column,
+                                       coalesce=True)
+            self.assertEquals(expected, actual)
+            self.assertEquals(1, reads)
+
+    def test_memory_map(self):
+        for column in self.columns:
+            expected, _ = self._read("test-data/example.parquet", column)
+            actual, reads = self._read("test-data/example.parquet", column,
+                                       memory_map=True)
+            self.assertEquals(expected, actual)
+            self.assertEquals(0, reads)
+
+    def test_memory_map_close(self):
+        with open("test-data/example.parquet", 'rb') as fo:
+            with parquet.FileReader(fo, memory_map=True) as reader:
+                mapping = reader._mapping
+                list(reader.column_reader("DocId").read())
+            self.assertEquals(None, reader._mapping)
+            self.assertRaises(ValueError, mapping.size)
+            reader.close()
+
+    def test_memory_map_invalid_file(self):
+        mapped = []
+        map_file = parquet._map_file
+        parquet._map_file = lambda fo: mapped.append(fo)
+        try:
+            for data in ["", "PAR1" + "x" * 20]:
+                with tempfile.TemporaryFile() as fo:
+                    fo.write(data)
+                    fo.flush()
+                    self.assertRaises(parquet.ParquetFormatException,
+                                      parquet.FileReader, fo,
+                                      memory_map=True)
+        finally:
+            parquet._map_file = map_file
+        self.assertEquals([], mapped)
+
+    def test_nulls(self):
+        values, _ = self._read("test-data/example.parquet", "Links.Forward",
+                               coalesce=True)
+        self.assertEquals([[0, 2, 20], [1, 2, 40], [1, 2, 60], [0, 2, 80]],
+                          values)
+
+
+class TestReadBatches(unittest.TestCase):
+
+    def test_binary_arrays(self):
+        with open("test-data/nation.plain.parquet", 'rb') as fo:
+            reader = parquet.FileReader(fo)
+            for column in ["name", "comment_col"]:
+                expected = [v for _, _, v in
+                            reader.column_reader(column).read()]
+                batches = list(reader.column_reader(column).read_batches(
+                    binary_arrays=True))
+                self.assertTrue(all(isinstance(vals, BinaryArray)
+                                    for _, _, vals in batches))
+                self.assertEquals(expected, [v for _, _, vals in batches
+                                             for v in vals.tolist()])
+
+    def test_dictionary_codes(self):
+        with open("test-data/nation.dict.parquet", 'rb') as fo:
+            reader = parquet.FileReader(fo)
+            expected = [v for _, _, v in reader.column_reader("name").read()]
+            batches = list(reader.column_reader("name").read_batches(
+                dictionary_codes=True))
+            self.assertTrue(all(isinstance(vals, DictionaryArray)
+                                for _, _, vals in batches))
+            self.assertEquals(expected, [v for _, _, vals in batches
+                                         for v in vals.tolist()])
+
+    def test_nullable(self):
+        with open("test-data/firewall.parquet", 'rb') as fo:
+            reader = parquet.FileReader(fo)
+            expected = [v for _, _, v in reader.column_reader("action").read()]
+            batches = list(reader.column_reader("action").read_batches(
+                nullable=True))
+            self.assertEquals(expected.count(None),
+                              sum(vals.null_count for _, _, vals in batches))
+            self.assertEquals(expected, [v for _, _, vals in batches
+                                         for v in vals.tolist()])
+
+    def test_typed_arrays(self):
+        def check():
+            with open("test-data/nation.plain.parquet", 'rb') as fo:
+                reader = parquet.FileReader(fo)
+                expected = [v for _, _, v in
+                            reader.column_reader("nation_key").read()]
+                batches = list(reader.column_reader(
+                    "nation_key").read_batches(typed_arrays=True,
+                                               nullable=True))
+            arrays = [vals.values for _, _, vals in batches]
+            self.assertFalse(any(isinstance(a, list) for a in arrays))
+            self.assertEquals(expected, [v for _, _, vals in batches
+                                         for v in vals.tolist()])
+            return batches
+        batches = check()
+        if parquet.encoding.numpy is not None:
+            self.assertEquals("int32", str(batches[0][2].values.dtype))
+            self.assertEquals(batches[0][2].tolist(),
+                              batches[0][2].to_masked().tolist())
+        without_numpy(check)
+
+    def test_level_arrays(self):
+        def check():
+            with open("test-data/example.parquet", 'rb') as fo:
+                reader = parquet.FileReader(fo)
+                rls, dls, _ = next(reader.column_reader(
+                    "Name.Language.Code").read_batches())
+                self.assertFalse(isinstance(rls, list))
+                self.assertFalse(isinstance(dls, list))
+                self.assertEquals([0, 2, 1, 1, 0], rls.tolist())
+                self.assertEquals([2, 2, 1, 2, 1], dls.tolist())
+                rls, dls, _ = next(reader.column_reader(
+                    "DocId").read_batches())
+                self.assertEquals(([], []), (rls.tolist(), dls.tolist()))
+        check()
+        without_numpy(check)
+
+    def test_read_lists(self):
+        with open("test-data/example.parquet", 'rb') as fo:
+            reader = parquet.FileReader(fo)
+            self.assertEquals(
+                [[["en-us", "en"], [], ["en-gb"]], [[]]],
+                reader.column_reader("Name.Language.Code").read_lists()
+                .tolist())
+            self.assertEquals(
+                [[], [10, 30]],
+                reader.column_reader("Links.Backward").read_lists().tolist())
+            self.assertRaises(ValueError,
+                              reader.column_reader("DocId").read_lists)
+
+    def test_converted_types(self):
+        for f in ["test-data/nation.plain.parquet",
+                  "test-data/nation.dict.parquet"]:
+            with open(f, 'rb') as fo:
+                reader = parquet.FileReader(fo)
+                expected = [v.decode('utf-8') for _, _, v in
+                            reader.column_reader("name").read()]
+                element = reader._schema_helper.schema_element("name")
+                element.converted_type = ConvertedType.UTF8
+                try:
+                    values = [v for _, _, vals in reader.column_reader(
+                                  "name").read_batches(converted_types=True)
+                              for v in vals]
+                finally:
+                    element.converted_type = None
+                self.assertEquals(expected, values)
+                self.assertTrue(all(isinstance(v, unicode) for v in values))
+
+    def _two_page_reader(self, reader, column):
+        """Returns a ColumnReader over a copy of the column's dictionary
+        encoded chunk with its data page repeated."""
+        index = reader._index
+        cmd = copy.copy(index.column_metadata(0, index.column(column)))
+        fo = reader._fo
+        offset = index.chunk(0, index.column(column))[0]
+        fo.seek(offset)
+        offsets = [offset]
+        for page_type in [PageType.DICTIONARY_PAGE, PageType.DATA_PAGE]:
+            ph = parquet._read_page_header(fo)
+            self.assertEquals(page_type, ph.type)
+            fo.seek(ph.compressed_page_size, os.SEEK_CUR)
+            offsets.append(fo.tell())
+        fo.seek(offset)
+        data = fo.read(offsets[2] - offset)
+        data += data[offsets[1] - offset:]
+        cmd.num_values *= 2
+        cmd.total_compressed_size = len(data)
+        column_reader = reader.column_reader(column, [data])
+        column_reader._column_meta_datas = [cmd]
+        return column_reader
+
+    def test_dictionary_converted_once(self):
+        calls = []
+        utf8 = parquet.converters.utf8
+
+        def counting_utf8(values):
+            calls.append(len(values))
+            return utf8(values)
+        with open("test-data/nation.dict.parquet", 'rb') as fo:
+            reader = parquet.FileReader(fo)
+            expected = [v.decode('utf-8') for _, _, v in
+                        reader.column_reader("name").read()]
+            element = reader._schema_helper.schema_element("name")
+            element.converted_type = ConvertedType.UTF8
+            parquet.converters.utf8 = counting_utf8
+            try:
+                batches = list(self._two_page_reader(
+                    reader, "name").read_batches(converted_types=True))
+            finally:
+                parquet.converters.utf8 = utf8
+                element.converted_type = None
+        self.assertEquals([expected, expected],
+                          [list(vals) for _, _, vals in batches])
+        self.assertEquals(1, len(calls))
+
+
+class TestFixedLenByteArray(unittest.TestCase):
+
+    values = ["\x00\x01\x02\x00", "abcd", "\xff\x00\x00\x00"]
+    element = leaf("h", Type.FIXED_LEN_BYTE_ARRAY, type_length=4)
+
+    def test_plain(self):
+        data = "".join(self.values)
+        self.assertEquals(self.values, decode_page(self.element, data, 3))
+        values = decode_page(self.element, data, 3, binary_arrays=True)
+        if parquet.encoding.numpy is not None:
+            self.assertEquals((3, 4), values.shape)
+        self.assertEquals(self.values, [str(bytearray(v)) for v in values])
+
+    def test_nullable(self):
+        element = leaf("h", Type.FIXED_LEN_BYTE_ARRAY,
+                       FieldRepetitionType.OPTIONAL, type_length=4)
+        # definition levels 1, 0, 1, 1 as a bit-packed run of width 1.
+        data = "\x02\x00\x00\x00\x03\x0d" + "".join(self.values)
+        expected = [self.values[0], None, self.values[1], self.values[2]]
+        values = decode_page(element, data, 4, binary_arrays=True,
+                             nullable=True)
+        self.assertEquals(expected, values.tolist())
+        self.assertEquals(expected, decode_page(
+            element, data, 4, nullable=True).tolist())
+        if parquet.columns.numpy is not None:
+            masked = values.to_masked()
+            self.assertEquals((4, 4), masked.shape)
+            self.assertEquals([False, True, False, False],
+                              masked.mask.all(axis=1).tolist())
+
+    def test_dictionary(self):
+        dictionary = parquet._decode_dictionary_page(
+            "".join(self.values[::-1]), column_metadata(self.element), 3)
+        self.assertEquals(self.values[::-1], dictionary)
+        # bit width 2, followed by a bit-packed run of the indices 2, 1, 0.
+        data = "\x02\x03\x06\x00"
+        self.assertEquals(self.values, decode_page(
+            self.element, data, 3, Encoding.PLAIN_DICTIONARY, dictionary))
+
+
+class TestInt96Dictionary(unittest.TestCase):
+
+    day = parquet.encoding.JULIAN_DAY_OF_EPOCH
+    # INT96 values as read by read_plain_int96: the nanoseconds of the day
+    # in the high 64 bits and the julian day in the low 32.
+    dictionary = [(5 << 32) | day, day + 1]
+    expected = [parquet.encoding.NANOS_PER_DAY, 5,
+                parquet.encoding.NANOS_PER_DAY]
+
+    def _decode(self, dictionary, **kwargs):
+        # bit width 1, followed by a bit-packed run of the indices 1, 0, 1.
+        return parquet.columns._values_list(decode_page(
+            leaf("t", Type.INT96), "\x01\x03\x05", 3,
+            Encoding.PLAIN_DICTIONARY, dictionary, int96_timestamps=True,
+            **kwargs))
+
+    def test_dictionary(self):
+        self.assertEquals(self.expected, self._decode(self.dictionary))
+
+    def test_dictionary_converted(self):
+        dictionary = parquet.encoding.int96_values_to_timestamps(
+            self.dictionary)
+        # the dictionary must not be converted a second time.
+        convert = parquet.encoding.int96_values_to_timestamps
+        parquet.encoding.int96_values_to_timestamps = None
+        try:
+            self.assertEquals(self.expected, self._decode(
+                dictionary, dictionary_converted=True))
+        finally:
+            parquet.encoding.int96_values_to_timestamps = convert
+
+
+class TestBoolean(unittest.TestCase):
+
+    element = leaf("b", Type.BOOLEAN)
+
+    def test_plain(self):
+        self.assertEquals([True, False, True],
+                          decode_page(self.element, "\x05", 3))
+        values = decode_page(self.element, "\x05", 3, typed_arrays=True)
+        if parquet.encoding.numpy is not None:
+            self.assertEquals("bool", str(values.dtype))
+        self.assertEquals([True, False, True], list(values))
+
+    def test_plain_without_numpy(self):
+        self.assertEquals([True, False, True], without_numpy(
+            lambda: decode_page(self.element, "\x05", 3)))
+
+    def test_dictionary_page(self):
+        cmd = column_metadata(self.element)
+        self.assertEquals([True, False],
+                          parquet._decode_dictionary_page("\x01", cmd, 2))
+        self.assertEquals([True, False], without_numpy(
+            lambda: parquet._decode_dictionary_page("\x01", cmd, 2)))
+
+
 class Options(object):
 
-    def __init__(self, col=None, format='csv', no_headers=True, limit=-1):
+    def __init__(self, col=None, format='csv', no_headers=True, limit=-1,
+                 coalesce=False, memory_map=False, prefetch=0, workers=0):
         self.col = col
         self.format = format
         self.no_headers = no_headers
         self.limit = limit
+        self.coalesce = coalesce
+        self.memory_map = memory_map
+        self.prefetch = prefetch
+        self.workers = workers
 
 
 class TestReadApi(unittest.TestCase):
@@ -100,6 +523,16 @@ class TestCompatibility(object):
         assert expected_data == actual_data, "{0} != {1}".format(
             str(expected_data), str(actual_data))
 
+        for options in (Options(coalesce=True), Options(memory_map=True),
+                        Options(prefetch=2), Options(workers=2)):
+            actual_raw_data = StringIO.StringIO()
+            parquet.dump(parquet_file, options, out=actual_raw_data)
+            actual_raw_data.seek(0, 0)
+            actual_data = list(csv.reader(actual_raw_data, delimiter='\t'))
+
+            assert expected_data == actual_data, "{0} != {1}".format(
+                str(expected_data), str(actual_data))
+
     def _test_file_json(self, parquet_file, csv_file):
         """ Given the parquet_file and csv_file representation, converts the
             parquet_file to json using the dump utility and then compares the
@@ -2,7 +2,9 @@
 
 import unittest
 
+import parquet.columns
 from parquet.schema import SchemaParser, SchemaHelper, RecordAssembler, RecordDissector
+from helpers import without_numpy
 
 d1 = {
   'DocId': 10,
@@ -187,5 +189,63 @@ class TestRecordAssemble(unittest.TestCase):
         ra.assemble()
         print "test_full_assemble done"
 
+class TestListOffsets(unittest.TestCase):
+
+    expected = {
+        'Links.Backward': [[], [10, 30]],
+        'Links.Forward': [[20, 40, 60], [80]],
+        'Name.Language.Code': [[["en-us", "en"], [], ["en-gb"]], [[]]],
+        'Name.Language.Country': [[["us", None], [], ["gb"]], [[]]],
+        'Name.Url': [["http://A", "http://B", None], ["http://C"]],
+    }
+
+    def test_repeated_definition_levels(self):
+        helper = SchemaHelper(SchemaParser().parse(schema_text))
+        self.assertEquals([], helper.repeated_definition_levels('DocId'))
+        self.assertEquals([2], helper.repeated_definition_levels(
+            'Links.Forward'))
+        self.assertEquals([1, 2], helper.repeated_definition_levels(
+            'Name.Language.Country'))
+
+    def _check(self):
+        helper = SchemaHelper(SchemaParser().parse(schema_text))
+        for path, expected in self.expected.items():
+            levels = field_values[path]
+            lists = parquet.columns.lists_from_levels(
+                [l[0] for l in levels], [l[1] for l in levels],
+                helper.repeated_definition_levels(path),
+                helper.max_definition_level(path),
+                [l[2] for l in levels if l[2] is not None])
+            self.assertEquals(expected, lists.tolist())
+
+    def test_lists_from_levels(self):
+        self._check()
+
+    def test_lists_from_levels_without_numpy(self):
+        without_numpy(self._check)
+
+    def test_not_repeated(self):
+        self.assertRaises(ValueError, parquet.columns.lists_from_levels,
+                          [0, 0], [0, 0], [], 0, [1, 2])
+
+    def test_concatenate_levels(self):
+        pages = [[0, 1], [], [2]]
+        self.assertEquals([0, 1, 2], list(
+            parquet.columns.concatenate_levels(pages)))
+        self.assertEquals(0, len(parquet.columns.concatenate_levels([])))
+        self.assertEquals([0, 1, 2], list(without_numpy(
+            lambda: parquet.columns.concatenate_levels(pages))))
+
+    def test_null_lists(self):
+        # repeated group a { optional group b { repeated int32 c; } }, with
+        # records [{b: null}], [{b: {c: []}}] and [].
+        (offsets, valid), (inner_offsets, inner_valid) = \
+            parquet.columns.list_offsets([0, 0, 0], [1, 2, 0], [1, 3])
+        self.assertEquals([0, 1, 2, 2], list(offsets))
+        self.assertEquals(None, valid)
+        self.assertEquals([0, 0, 0], list(inner_offsets))
+        self.assertEquals([False, True], list(inner_valid))
+
+
 if __name__ == '__main__':
     unittest.main()
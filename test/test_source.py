@@ -0,0 +1,83 @@
+import StringIO
+import threading
+import unittest
+
+import parquet
+from parquet.source import Cursor, PositionalFile
+
+
+class TestCursor(unittest.TestCase):
+
+    def test_independent_positions(self):
+        source = PositionalFile(StringIO.StringIO("0123456789"))
+        a = Cursor(source)
+        b = Cursor(source, 5)
+        self.assertEquals("01", a.read(2))
+        self.assertEquals("56", b.read(2))
+        self.assertEquals("23", a.read(2))
+        self.assertEquals(7, b.tell())
+
+    def test_seek(self):
+        source = PositionalFile(StringIO.StringIO("0123456789"))
+        c = Cursor(source)
+        c.seek(-3, 2)
+        self.assertEquals("789", c.read())
+        c.seek(2)
+        c.seek(1, 1)
+        self.assertEquals("3", c.read(1))
+        self.assertRaises(IOError, c.seek, -1)
+
+    def test_readinto(self):
+        for fo in (StringIO.StringIO("0123456789"),
+                   open("test-data/nation.csv", 'rb')):
+            c = Cursor(PositionalFile(fo), 2)
+            buf = bytearray(4)
+            self.assertEquals(4, c.readinto(memoryview(buf)))
+            self.assertEquals(6, c.tell())
+            fo.seek(2)
+            self.assertEquals(fo.read(4), str(buf))
+
+
+class TestSharedFile(unittest.TestCase):
+
+    columns = ["DocId", "Links.Backward", "Links.Forward",
+               "Name.Language.Code", "Name.Language.Country", "Name.Url"]
+
+    def test_interleaved_readers(self):
+        with open("test-data/example.parquet", 'rb') as fo:
+            reader = parquet.FileReader(fo)
+            expected = [list(reader.column_reader(c).read())
+                        for c in self.columns]
+            generators = [reader.column_reader(c).read()
+                          for c in self.columns]
+            actual = [[] for c in self.columns]
+            done = False
+            while not done:
+                done = True
+                for values, gen in zip(actual, generators):
+                    for v in gen:
+                        values.append(v)
+                        done = False
+                        break
+        self.assertEquals(expected, actual)
+
+    def test_threads(self):
+        with open("test-data/nation.impala.parquet", 'rb') as fo:
+            reader = parquet.FileReader(fo)
+            columns = ["n_nationkey", "n_name", "n_regionkey", "n_comment"]
+            expected = dict((c, list(reader.column_reader(c).read()))
+                            for c in columns)
+            actual = {}
+
+            def read(column):
+                for i in range(20):
+                    values = list(reader.column_reader(column).read())
+                    if actual.setdefault(column, values) != values:
+                        actual[column] = None
+            threads = [threading.Thread(target=read, args=(c,))
+                       for c in columns]
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+        self.assertEquals(expected, actual)